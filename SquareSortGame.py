@@ -1,15 +1,23 @@
+import os
 from warnings import warn
-from sys import stdin
+from sys import stdin, argv, exit
 from time import perf_counter as tt
 from time import sleep 
 from collections import deque, namedtuple, defaultdict
-from bisect import bisect
 from copy import copy
-from math import sqrt
+from math import sqrt, inf
 from itertools import repeat
 
 
 from search import *
+from vectorized import VectorBreadthFirstSearch, VectorBidirectionSearch
+from parallel import ParallelBreadthFirstSearch
+from external import ExternalBreadthFirstSearch
+from board import Layout
+from heuristic import Hamming, Manhattan, Hybrid, LinearConflict, WalkingDistance
+from patterndb import PatternDatabase, DistanceTable, cache_dir
+from scramble import inversions, solvable, repair
+from cache import SolutionCache
 
 
 
@@ -26,14 +34,11 @@ class State(tuple):
     def state(self):
         return self[1]
     
-    def __len__(self):
-        return len(self[1])
-    
     def __hash__(self):
-        return hash(tuple(self[1]))
+        return hash(self[1])
     
     def __eq__(self, x):
-        return self[0] == x[0]
+        return self[1] == x[1]
     
     def __repr__(self):
         return "State {a}: {b}".format(a=self[0], b=str(self[1]))
@@ -56,12 +61,6 @@ class State(tuple):
     def __format__(self, f):
         return f"{str(self):{f}}"
 
-    def index(self, x):
-        return self[1].split(' ').index(x)
-        
-    def split(self, x):
-        return self[1].split(x)
-
 
 
 class SquareSortGame:
@@ -70,17 +69,45 @@ class SquareSortGame:
         'bfs': BreadthFirstSearch, 
         'dfs': DepthFirstSearch, 
         'bid': BidirectionSearch, 
+        'vbfs': VectorBreadthFirstSearch,
+        'vbid': VectorBidirectionSearch,
+        'pbfs': ParallelBreadthFirstSearch,
+        'ebfs': ExternalBreadthFirstSearch,
         'ham': HeuristicSearch,
         'man': HeuristicSearch,
         'hyb': HeuristicSearch,
+        'astham': AStarSearch,
+        'astman': AStarSearch,
+        'asthyb': AStarSearch,
+        'pdb': HeuristicSearch,
+        'astpdb': AStarSearch,
+        'astlc': AStarSearch,
+        'astwd': AStarSearch,
         'idaham': IDASearch,
         'idaman': IDASearch,
         'idahyb': IDASearch,
+        'idapdb': IDASearch,
+        'idalc': IDASearch,
+        'idawd': IDASearch,
+        'araman': AnytimeSearch,
+        'aralc': AnytimeSearch,
+        'arawd': AnytimeSearch,
+        'arapdb': AnytimeSearch,
+        'beamman': BeamSearch,
+        'beamlc': BeamSearch,
         'fore': ForeseeSearch,
+        'tab': DescentSearch,
         }
+    
+    # Methods whose paths are shortest, so fit for the solution cache.
+    optimal_methods = { 'bfs', 'bid', 'vbfs', 'vbid', 'pbfs', 'ebfs',
+                        'astham', 'astman', 'astpdb', 'astlc', 'astwd',
+                        'idaham', 'idaman', 'idapdb', 'idalc', 'idawd', 'tab' }
 
-    def __init__(self, width):
+    def __init__(self, width, cache=None):
         self.width = width
+        self.layout = Layout.of(width)
+        self.cache = cache
     
     def new(self, heuristic_name: str=None):
         self.stack = []
@@ -100,15 +127,27 @@ class SquareSortGame:
     
     def make_state(self, state):
         transform = self.chosen_heuristic
-        return ( state if transform is None and isinstance(state, str) else 
-                 state.state if transform is None and isinstance(state, State) else
+        return ( state if transform is None and not isinstance(state, State) else 
+                 state.state if transform is None else
                  State(transform(state.state),  state.state) if isinstance(state, State) else
                  State(transform(state), state)
                 )
     
+    def make_child(self, parent, position):
+        # Slide the tile at position into the blank, and carry the parent's
+        # heuristic value forward by the single-tile delta.
+        transform = self.chosen_heuristic
+        layout = self.layout
+        if transform is None:
+            return layout.slide(parent, position)
+        board = parent.state
+        child = layout.slide(board, position)
+        value = transform.update(parent.value, child, layout.tile(board, position),
+                                 position, layout.zero(board))
+        return State(value, child)
+    
     def get_end_state(self, width=None):
-        w = width or self.width
-        s = ' '.join(map( str, tuple(range(1,w**2))+(0,) ))
+        s = Layout.of(width or self.width).goal
         if self.chosen_heuristic is None:
             return s
         else:
@@ -116,47 +155,27 @@ class SquareSortGame:
        
     def rand_state(self):
         from random import shuffle
-        is_solvable = self.is_solvable
-        result = ( self.end_state.state.split(' ') 
-                   if isinstance(self.end_state, State) else 
-                   self.end_state.split(' ')  )
+        layout = self.layout
+        result = layout.unpack(layout.goal)
         shuffle(result)
-        while not is_solvable(result):
-            shuffle(result)
-        s = ' '.join(map(str,result))
-        return self.make_state(s)
+        return self.make_state(layout.pack(repair(result, self.width)))
 
     @staticmethod
     def TimBabych(state):
         if isinstance(state, str):
             state = state.split(' ')
-        s = [x for x in map(int, state) if x]
-        parity = 0
-        sorted_left = []
-        for i, u in enumerate(s):
-            # i is also the length of sorted_left
-            insert_pt = bisect(sorted_left, u)
-            parity += i - insert_pt
-            sorted_left.insert(insert_pt, u)
-        return parity
+        return inversions(list(map(int, state)))
     
     @staticmethod
     def is_solvable(state):
-        s = [x for x in map(int, state) if x]
-        parity = 0
-        sorted_left = []
-        for i, u in enumerate(s):
-            # i is also the length of sorted_left
-            insert_pt = bisect(sorted_left, u)
-            parity ^= (i - insert_pt)%2
-            sorted_left.insert(insert_pt, u)
-        return parity==0
+        if isinstance(state, str):
+            state = state.split(' ')
+        return solvable(list(map(int, state)))
     
-    @staticmethod
-    def draw(state):
+    def draw(self, state):
         s = state.state if isinstance(state, State) else state
-        s = s.split(' ')
-        w = int(sqrt(len(s)))
+        s = self.layout.format(s).split(' ')
+        w = self.width
         maxlen = len(str(len(s)))
         board = ( (x if x else ' ' for x in y) 
                   for y in zip(* repeat(iter(s), w) ) )
@@ -165,9 +184,8 @@ class SquareSortGame:
         result = '\n'.join(board)
         return result
     
-    @staticmethod
-    def print(state):
-        print(SquareSortGame.draw(state), end='\n\n')
+    def print(self, state):
+        print(self.draw(state), end='\n\n')
     
     def now(self):
         print("*** now ***")
@@ -179,21 +197,33 @@ class SquareSortGame:
     def check(self) -> bool:
         return self.current_state == self.end_state
     
-    def hamming_distance(self, state, end_state=None):
-        me, emeny = state, end_state or self.end_state
-        me, emeny = map(int, me.split(' ')), map(int, emeny.split(' '))
-        return sum( x!=y for x,y in zip(me, emeny) )
+    @property
+    def hamming_distance(self):
+        return Hamming.of(self.width)
     
-    def manhattan_distance(self, state, end_state=None):
-        me, emeny = state, end_state or self.end_state
-        me, emeny = map(int, me.split(' ')), map(int, emeny.split(' '))
-        w = self.width
-        return sum( abs(a//w-b//w)+abs(a%w-b%w) for a,b in zip(me, emeny) )
+    @property
+    def manhattan_distance(self):
+        return Manhattan.of(self.width)
     
-    def hybrid_distance(self, state, end_state=None):
-        return ( self.hamming_distance(state, end_state) 
-                +self.manhattan_distance(state, end_state)
-                )
+    @property
+    def hybrid_distance(self):
+        return Hybrid.of(self.width)
+    
+    @property
+    def linear_conflict(self):
+        return LinearConflict.of(self.width)
+    
+    @property
+    def walking_distance(self):
+        return WalkingDistance.of(self.width)
+    
+    @property
+    def pattern_database(self):
+        return PatternDatabase.of(self.width)
+    
+    @property
+    def distance_table(self):
+        return DistanceTable.of(self.width)
     
     @property
     def heuristic_methods(self):
@@ -201,58 +231,167 @@ class SquareSortGame:
             'ham': self.hamming_distance,
             'man': self.manhattan_distance,
             'hyb': self.hybrid_distance,
+            'astham': self.hamming_distance,
+            'astman': self.manhattan_distance,
+            'asthyb': self.hybrid_distance,
+            'pdb': self.pattern_database,
+            'astpdb': self.pattern_database,
+            'astlc': self.linear_conflict,
+            'astwd': self.walking_distance,
             'idaham': self.hamming_distance,
             'idaman': self.manhattan_distance,
             'idahyb': self.hybrid_distance,
+            'idapdb': self.pattern_database,
+            'idalc': self.linear_conflict,
+            'idawd': self.walking_distance,
+            'araman': self.manhattan_distance,
+            'aralc': self.linear_conflict,
+            'arawd': self.walking_distance,
+            'arapdb': self.pattern_database,
+            'beamman': self.manhattan_distance,
+            'beamlc': self.linear_conflict,
             'fore': self.hybrid_distance,
+            'tab': self.distance_table,
             }
         
     def possible_move(self, state=None, debug=0):
-        state = state or self.current_state
-        state = state if self.chosen_heuristic is None else state.state
-        state = state.split(' ')
-        w = self.width
-        zero_at = state.index('0')
+        parent = self.make_state(state or self.current_state)
+        state = parent if self.chosen_heuristic is None else parent.state
+        layout = self.layout
+        zero_at = layout.zero(state)
         if debug: print(f"zero_at = {zero_at}")
-        
-        def _where(width, linear_position):
-            lp = linear_position
-            i, j = lp//width, lp%width
-            if debug: print(f"i,j = {i}, {j}")
-            return i, j
-            
-        i, j = _where(w, zero_at)
-        
-        def _neighbors(state, width, linear_position, i, j):
-            from operator import itemgetter
-            
-            lp = linear_position
-            targets = set()
-            push = targets.add
-            if i != 0: push('up')
-            if i != width-1: push('down')
-            if j != 0: push('left')
-            if j != width-1: push('right')
-            if debug: print(f"targets = {targets}")
-            
-            doit = {'up'   : lambda k: k-width,
-                    'down' : lambda k: k+width,
-                    'left' : lambda k: k-1,
-                    'right': lambda k: k+1, 
-                    }
-            
-            linear_positions = [ doit[t](lp) for t in targets ]
-            if debug: print(f"_neighbors at {linear_positions}")
-            return linear_positions
-        
-        if debug: print("possible moves")
+        if debug: print(f"_neighbors at {layout.moves[zero_at]}")
         new_states = dict()
-        for x in _neighbors(state, w, zero_at, i, j):
-            temp = list(state[:])
-            temp[zero_at], temp[x] = state[x], '0'
-            new_states[state[x]] = self.make_state(' '.join(temp))
+        for x in layout.moves[zero_at]:
+            new_states[layout.tile(state, x)] = self.make_child(parent, x)
         return new_states
     
+    def childs(self, node, parent=None):
+        # Fast child generation for the search engines: a plain list of
+        # nodes straight from the move table, no dict of States. With the
+        # parent given, the move back to it is not generated.
+        transform = self.chosen_heuristic
+        layout = self.layout
+        children, zero = layout.children, layout.zero
+        if transform is None:
+            prev = -1 if parent is None else zero(parent)
+            return [child for _, _, child in children(node, prev)]
+        h, board = node
+        prev = -1 if parent is None else zero(parent[1])
+        z = zero(board)
+        update = transform.update
+        return [ State(update(h, child, x, i, z), child)
+                 for x, i, child in children(board, prev) ]
+    
+    def solver(self, method, state=None, queue=None, visited='set', callback=None, every=None,
+               **options):
+        # Search engine for method, set up on state (default: current board).
+        # queue picks the open list of the best-first engines, visited how
+        # the blind engines remember boards ('set', or 'bitset' up to 3x3); callback
+        # gets the engine every `every` expansions. Other options are set on
+        # the engine, e.g. time_limit for the anytime search; a name not in
+        # the engine's OPTIONS raises TypeError.
+        search_method = self.search_methods[method]
+        self.chosen_heuristic = self.heuristic_methods.get(method, None)
+        self.end_state = self.get_end_state()
+        solving = search_method(
+            start_node=self.make_state(self.current_state if state is None else state),
+            end_node=self.end_state,
+            child_func=self.childs,
+            cost=lambda x: 1,
+            layout=self.layout,
+            heuristic=self.chosen_heuristic,
+            queue=queue,
+            visited=visited,
+            callback=callback,
+            every=every,
+            )
+        for key, value in options.items():
+            # a misspelt or misplaced budget fails instead of being ignored
+            if key not in solving.OPTIONS:
+                raise TypeError(f"{method} ({type(solving).__name__}) has no option {key!r}")
+            setattr(solving, key, value)
+        return solving
+    
+    def solve(self, board, method, callback=None, every=None, **options):
+        """Solve one board quietly and report it as a plain dict, with the
+        engine's counters under 'stats' and, for the anytime search, the
+        suboptimality bound of the answer under 'bound'. With a solution
+        cache, a board already on a stored path comes back from it with
+        'cached' true and no search. board may be
+        packed, a list of tiles or a space-separated string; a list or string
+        must be a solvable board.
+        """
+        layout = self.layout
+        if isinstance(board, str):
+            board = board.replace(',', ' ').split()
+        if isinstance(board, (list, tuple)):
+            tiles = [int(x) for x in board]
+            if sorted(tiles) != list(range(layout.size)):
+                raise ValueError(f"Not a board of width {self.width}: {' '.join(map(str, board))}")
+            if not solvable(tiles, self.width):
+                raise ValueError(f"Unsolvable board: {' '.join(map(str, tiles))}")
+            board = layout.pack(tiles)
+        cache = self.cache
+        if cache is not None:
+            start = tt()
+            path = cache.get(board)
+            if path is not None:
+                moves = self.moves_of(path)
+                return {
+                    'board': layout.format(board),
+                    'method': method,
+                    'found': True,
+                    'length': None if moves is None else len(moves),
+                    'moves': moves,
+                    'path': [layout.format(x) for x in path],
+                    'expansions': 0,
+                    'time': tt() - start,
+                    'stats': {},
+                    'bound': None,
+                    'cached': True,
+                    }
+        solving = self.solver(method, board, callback=callback, every=every, **options)
+        _, timelog = solving.timeit(verbose=False)
+        path = [getattr(x, 'state', x) for x in solving.path]
+        # no moves for a search that gave up, unlike a board already solved
+        moves = self.moves_of(path) if solving.found else None
+        bound = getattr(solving, 'bound', None)
+        self.remember(method, path, moves)
+        return {
+            'board': layout.format(board),
+            'method': method,
+            'found': bool(solving.found),
+            'length': None if moves is None else len(moves),
+            'moves': moves,
+            'path': [layout.format(x) for x in path],
+            'expansions': solving.step,
+            'time': timelog,
+            'stats': solving.stats,
+            'bound': None if bound == inf else bound,
+            'cached': False,
+            }
+    
+    def remember(self, method, path, moves=()):
+        # Keep a found shortest path in the solution cache, if any.
+        if ( self.cache is not None and method in self.optimal_methods and
+             moves is not None and path and path[-1] == self.layout.goal ):
+            self.cache.put(path)
+    
+    def moves_of(self, path):
+        # Tiles moved along a path of packed boards, or None when the path
+        # is empty or skips over boards (e.g. BFS only reports its two ends).
+        if not path:
+            return None
+        layout = self.layout
+        zero, moves = layout.zero, layout.moves
+        result = []
+        for a, b in zip(path, path[1:]):
+            if zero(b) not in moves[zero(a)] or layout.slide(a, zero(b)) != b:
+                return None
+            result.append(layout.tile(b, zero(a)))
+        return result
+    
     def show(self):
         # show possible move
         result = ["=== possible moves ==="]
@@ -328,7 +467,7 @@ class SquareSortGame:
                         if inp in _L1_end:
                             break
                     elif ( (not inp.isdigit()) or 
-                         (inp.isdight() and int(inp) not in self.next) 
+                         (inp.isdigit() and int(inp) not in self.next) 
                          ):
                         print("Please input *interger* that match any of the possible moves.")
                         nextround = 1
@@ -367,13 +506,18 @@ class SquareSortGame:
                 continue
             
             self.restart()
-            solving = search_method(
-                start_node=self.current_state,
-                end_node= self.end_state,
-                child_func=lambda state: self.possible_move(state).values(),
-                cost=lambda x: 1
-                )                
+            if self.cache is None:
+                self.cache = SolutionCache(self.width, os.path.join(cache_dir(), 'solutions.sqlite'))
+            board = getattr(self.current_state, 'state', self.current_state)
+            path = self.cache.get(board)
+            if path is not None:
+                print(f"from the solution cache: {len(path)-1} moves")
+                print(' '.join(map(str, self.moves_of(path))))
+                continue
+            solving = self.solver(inp)
             solving.timeit()
+            path = [getattr(x, 'state', x) for x in solving.path]
+            self.remember(inp, path, self.moves_of(path))
             
         return None
     
@@ -385,6 +529,10 @@ class SquareSortGame:
         
 
 if __name__ == '__main__':
+    if len(argv) > 1:
+        # python SquareSortGame.py solve --width 4 --method idaman --jobs 8
+        from batch import main
+        exit(main(argv[1:]))
     title = """
     ######################################################################
       #####        ###       ##     ##      ###      #######     #########
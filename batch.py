@@ -0,0 +1,109 @@
+# Batch solving
+import json
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice, chain
+from os import cpu_count
+
+from board import Layout
+from cache import SolutionCache
+from SquareSortGame import SquareSortGame
+
+
+# Solution caches of this process by (width, path), kept across chunks.
+_caches = {}
+
+
+def solve_chunk(width, method, jobs, cache=None):
+    # Boards that do not parse come back as {'index', 'board', 'method',
+    # 'error'} instead of stopping the whole batch. cache is the path of a
+    # solution cache file, or None for none.
+    if cache is not None and (width, cache) not in _caches:
+        _caches[width, cache] = SolutionCache(width, cache)
+    game = SquareSortGame(width, None if cache is None else _caches[width, cache])
+    results = []
+    for index, board in jobs:
+        try:
+            result = game.solve(board, method)
+        except ValueError as e:
+            result = {'board': board, 'method': method, 'error': str(e)}
+        result['index'] = index
+        results.append(result)
+    return results
+
+
+def solve_many(boards, method, width, workers=None, chunksize=8, backlog=2, cache=None):
+    """Solve boards with one method over a process pool.
+
+    Boards are sent in chunks of `chunksize`, with at most `backlog` chunks
+    per worker in flight, so a long or lazy input is never held in memory
+    at once. Results are yielded as each chunk finishes, as the dicts from
+    SquareSortGame.solve with the board's input position under 'index'.
+    cache is the path of a solution cache file shared by the workers.
+    """
+    workers = workers or cpu_count() or 1
+    jobs = enumerate(boards)
+    with ProcessPoolExecutor(workers) as pool:
+        pending = set()
+
+        def submit():
+            chunk = list(islice(jobs, chunksize))
+            if chunk:
+                pending.add(pool.submit(solve_chunk, width, method, chunk, cache))
+            return bool(chunk)
+
+        while len(pending) < workers*backlog and submit():
+            pass
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+                submit()
+
+
+def solve_lines(lines, method, width=None, jobs=1, chunksize=1, cache=None):
+    """Solve one board per non-blank line, yielding result dicts as they
+    finish. The width defaults to that of the first board.
+    """
+    boards = (line.strip() for line in lines)
+    boards = (x for x in boards if x)
+    first = next(boards, None)
+    if first is None:
+        return
+    boards = chain([first], boards)
+    width = width or Layout.width_of(first)
+    if jobs == 1:
+        for job in enumerate(boards):
+            yield from solve_chunk(width, method, [job], cache)
+    else:
+        yield from solve_many(boards, method, width, jobs, chunksize, cache=cache)
+
+
+def main(argv=None):
+    parser = ArgumentParser(prog='SquareSortGame.py',
+                            description="Solve boards without prompting.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    solve = commands.add_parser('solve', help="solve one board per line, one JSON result per line")
+    solve.add_argument('file', nargs='?', default='-', help="boards to solve (default: stdin)")
+    solve.add_argument('--width', type=int, help="board width (default: from the first board)")
+    solve.add_argument('--method', default='idaman', choices=sorted(SquareSortGame.search_methods))
+    solve.add_argument('--jobs', type=int, default=1, help="worker processes, 0 for one per CPU")
+    solve.add_argument('--chunksize', type=int, default=1, help="boards sent to a worker at once")
+    solve.add_argument('--cache', metavar='PATH',
+                       help="answer repeats from, and keep shortest solutions in, this sqlite file")
+    args = parser.parse_args(argv)
+
+    f = sys.stdin if args.file == '-' else open(args.file)
+    try:
+        for result in solve_lines(f, args.method, args.width, args.jobs or None, args.chunksize,
+                                  args.cache):
+            print(json.dumps(result), flush=True)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+# Benchmarks
+import csv
+import json
+import os
+import sys
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from itertools import product
+from multiprocessing import Pipe, Process
+
+import scramble
+from board import Layout
+from search import peak_rss_kib
+from SquareSortGame import SquareSortGame
+
+
+# Fixed instance sets: (board, optimal solution length). std3 are seeded
+# shuffles, std4 seeded 70-move random walks kept to ones IDA* with walking
+# distance solves in seconds. Korf's 100 15-puzzle instances are not
+# bundled; read them with --file and --korf.
+STANDARD = {
+    'std3': (3, (
+        ('3 2 1 5 0 4 6 7 8', 26),
+        ('8 5 6 3 7 4 0 1 2', 26),
+        ('4 1 5 3 8 7 6 2 0', 22),
+        ('2 0 4 8 3 5 6 7 1', 23),
+        ('7 2 6 4 1 3 8 5 0', 20),
+        ('2 0 4 3 1 8 7 6 5', 21),
+        ('1 2 0 6 4 3 8 5 7', 18),
+        ('2 0 3 4 6 5 7 8 1', 19),
+        ('0 2 4 3 5 6 7 8 1', 20),
+        ('3 7 2 6 0 5 8 4 1', 26),
+        ('3 6 0 7 8 1 5 2 4', 24),
+        ('3 7 2 0 4 5 6 8 1', 27),
+        ('2 5 0 8 4 7 6 1 3', 24),
+        ('2 0 3 7 8 5 4 6 1', 21),
+        ('5 0 6 3 1 2 8 4 7', 21),
+        ('0 7 3 4 5 1 6 8 2', 24),
+        ('8 3 0 4 1 5 7 2 6', 14),
+        ('4 2 7 5 6 8 0 1 3', 24),
+        ('4 3 8 2 6 1 7 0 5', 15),
+        ('4 6 8 2 7 3 5 1 0', 24),
+        )),
+    'std4': (4, (
+        ('1 6 2 4 9 0 7 3 12 5 10 15 13 11 14 8', 28),
+        ('7 1 5 4 3 14 11 0 2 6 13 8 9 10 15 12', 36),
+        ('1 6 0 3 5 8 14 13 2 11 12 4 7 9 10 15', 40),
+        ('10 2 1 8 5 0 3 7 12 9 4 15 11 6 13 14', 38),
+        ('8 10 7 4 13 11 6 0 3 1 15 2 5 9 14 12', 42),
+        ('13 1 15 2 6 5 7 0 14 12 9 3 8 4 10 11', 46),
+        ('6 7 3 2 1 5 12 0 10 11 8 4 14 9 13 15', 34),
+        ('0 7 6 3 10 5 2 15 11 8 12 4 1 13 14 9', 42),
+        )),
+    }
+
+FIELDS = ('set', 'index', 'width', 'method', 'visited', 'board', 'status', 'found', 'length',
+          'optimal', 'expansions', 'time', 'rate', 'peak_kib', 'error')
+
+
+def shuffled(width, count, seed=0):
+    """Uniformly shuffled solvable boards from a seeded generator."""
+    layout = Layout.of(width)
+    for board in scramble.shuffled(width, count, seed):
+        yield layout.format(board), None
+
+
+def walks(width, count, moves, seed=0):
+    """Boards `moves` random non-reversing blank moves away from the goal."""
+    layout = Layout.of(width)
+    for board in scramble.walk(width, moves, count, seed):
+        yield layout.format(board), None
+
+
+def korf(tiles):
+    # Korf's boards have the blank first in the goal; turning the board
+    # half a turn and renumbering tile t as n-t gives the same puzzle with
+    # the goal used here.
+    n = len(tiles)
+    return [(n-t) % n for t in reversed(tiles)]
+
+
+def read_instances(path, convert=False):
+    """Boards from a text file, one per line, with an optional leading
+    index as in Korf's list. Returns (width, [(board, None), ...]).
+    """
+    boards = []
+    with open(path) as f:
+        for line in f:
+            tiles = [int(x) for x in line.replace(',', ' ').split()]
+            if not tiles:
+                continue
+            width = int(len(tiles)**0.5)
+            if width*width != len(tiles):
+                tiles = tiles[1:]
+            if convert:
+                tiles = korf(tiles)
+            boards.append((' '.join(map(str, tiles)), None))
+    return Layout.width_of(boards[0][0]), boards
+
+
+def _solve(conn, width, method, board, visited):
+    # Child process: solve one board and send back the result dict, with
+    # the growth of the peak resident set while solving.
+    try:
+        with open(os.devnull, 'w') as null, redirect_stdout(null):
+            before = peak_rss_kib()
+            result = SquareSortGame(width).solve(board, method, visited=visited)
+            after = peak_rss_kib()
+        result['peak_kib'] = None if before is None else after - before
+        conn.send(('ok', result))
+    except Exception as e:
+        conn.send(('error', repr(e)))
+    conn.close()
+
+
+def measure(width, method, board, limit, visited='set'):
+    """Solve one board in a child process, killed after `limit` seconds.
+    Returns (status, result dict or error text or None).
+    """
+    here, there = Pipe(duplex=False)
+    # not a daemon, so methods that start processes of their own can
+    proc = Process(target=_solve, args=(there, width, method, board, visited))
+    proc.start()
+    there.close()
+    try:
+        if here.poll(limit):
+            return here.recv()
+        return 'timeout', None
+    except EOFError:
+        return 'error', f"exit code {proc.exitcode}"
+    finally:
+        if proc.is_alive():
+            proc.terminate()
+        proc.join()
+        here.close()
+
+
+def bench(name, width, instances, methods, limit, visited=('set',)):
+    """One row per instance, method and way of keeping visited boards,
+    as a dict over FIELDS.
+    """
+    for index, (board, optimal) in enumerate(instances):
+        for method, mode in product(methods, visited):
+            status, result = measure(width, method, board, limit, mode)
+            row = dict.fromkeys(FIELDS)
+            row.update(set=name, index=index, width=width, method=method, visited=mode,
+                       board=board, status=status, optimal=optimal)
+            if status == 'ok':
+                for key in ('found', 'length', 'expansions', 'time', 'peak_kib'):
+                    row[key] = result[key]
+                row['rate'] = result['expansions'] / result['time'] if result['time'] else None
+            elif status == 'timeout':
+                row['time'] = limit
+            else:
+                row['error'] = result
+            yield row
+
+
+def write_rows(rows, path=None):
+    # CSV to stdout or a .csv file as rows come in, a JSON list to .json.
+    if path and path.endswith('.json'):
+        rows = list(rows)
+        with open(path, 'w') as f:
+            json.dump(rows, f, indent=1)
+        return rows
+    f = open(path, 'w', newline='') if path else sys.stdout
+    try:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        result = []
+        for row in rows:
+            writer.writerow(row)
+            f.flush()
+            result.append(row)
+        return result
+    finally:
+        if path:
+            f.close()
+
+
+def read_rows(path):
+    if path.endswith('.json'):
+        with open(path) as f:
+            return json.load(f)
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def number(x):
+    return None if x in (None, '') else float(x)
+
+
+def key(row):
+    # Runs from before the visited column count as 'set'.
+    return str(row['set']), str(row['index']), row['method'], row.get('visited') or 'set'
+
+
+def label(row):
+    visited = row.get('visited') or 'set'
+    return row['method'] if visited == 'set' else f"{row['method']}/{visited}"
+
+
+def compare(rows, baseline, out=sys.stderr):
+    """Per-method totals over the instances both runs solved, with the
+    ratio new/old of time and expansions, and how many got a longer
+    solution than before.
+    """
+    old = { key(r): r for r in baseline if r['status'] == 'ok' }
+    totals = {}
+    for r in rows:
+        o = old.get(key(r))
+        if r['status'] != 'ok' or o is None:
+            continue
+        t = totals.setdefault(label(r), [0, 0., 0., 0., 0., 0])
+        t[0] += 1
+        t[1] += number(o['time'])
+        t[2] += number(r['time'])
+        t[3] += number(o['expansions'])
+        t[4] += number(r['expansions'])
+        t[5] += (number(r['length']) or 0) > (number(o['length']) or 0)
+    print(f"{'method':<8} {'n':>4} {'time old':>10} {'time new':>10} {'ratio':>6} "
+          f"{'exp ratio':>9} {'longer':>6}", file=out)
+    for method, (n, t0, t1, e0, e1, longer) in totals.items():
+        print(f"{method:<8} {n:>4} {t0:>10.3f} {t1:>10.3f} {t1/t0 if t0 else 0:>6.2f} "
+              f"{e1/e0 if e0 else 0:>9.2f} {longer:>6}", file=out)
+    return totals
+
+
+def compare_visited(rows, out=sys.stderr):
+    """Per-method totals of peak memory growth and time for each way of
+    keeping visited boards, over the instances every way solved.
+    """
+    modes = list(dict.fromkeys(r['visited'] for r in rows))
+    runs = {}
+    for r in rows:
+        runs.setdefault((r['method'], str(r['set']), str(r['index'])), {})[r['visited']] = r
+    totals = {}
+    for (method, _, _), done in runs.items():
+        if any(done.get(m, {}).get('status') != 'ok' for m in modes):
+            continue
+        t = totals.setdefault(method, [0] + [0.] * (2*len(modes)))
+        t[0] += 1
+        for i, m in enumerate(modes):
+            t[2*i+1] += number(done[m]['peak_kib']) or 0
+            t[2*i+2] += number(done[m]['time'])
+    print(f"{'method':<8} {'n':>4} " +
+          ' '.join(f"{m+' KiB':>12} {m+' s':>10}" for m in modes), file=out)
+    for method, (n, *sums) in totals.items():
+        print(f"{method:<8} {n:>4} " +
+              ' '.join(f"{k:>12.0f} {s:>10.3f}" for k, s in zip(sums[::2], sums[1::2])),
+              file=out)
+    return totals
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Benchmark search methods on fixed or seeded boards.")
+    parser.add_argument('--set', default='std3', choices=sorted(STANDARD),
+                        help="bundled instance set (default std3)")
+    parser.add_argument('--file', help="read boards from a file instead, one per line")
+    parser.add_argument('--korf', action='store_true',
+                        help="boards in the file use a blank-first goal, as in Korf's list")
+    parser.add_argument('--random', type=int, metavar='N', help="N seeded boards instead")
+    parser.add_argument('--width', type=int, default=3, help="width of --random boards")
+    parser.add_argument('--walk', type=int, metavar='MOVES',
+                        help="make --random boards by random walks of MOVES moves")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--methods', help="comma-separated methods (default: all)")
+    parser.add_argument('--limit', type=float, default=10., help="seconds per instance")
+    parser.add_argument('--visited', default='set',
+                        help="comma-separated ways the blind searches keep visited boards, "
+                             "set and/or bitset (3x3 at most); several also compare "
+                             "their memory")
+    parser.add_argument('--out', help="write .csv or .json here (default: CSV to stdout)")
+    parser.add_argument('--baseline', help="compare with an earlier .csv or .json run")
+    args = parser.parse_args(argv)
+
+    if args.file:
+        name = os.path.basename(args.file)
+        width, instances = read_instances(args.file, args.korf)
+    elif args.random:
+        width = args.width
+        name = f"{'walk' if args.walk else 'random'}{width}-{args.seed}"
+        instances = list( walks(width, args.random, args.walk, args.seed) if args.walk else
+                          shuffled(width, args.random, args.seed) )
+    else:
+        name = args.set
+        width, instances = STANDARD[name]
+    methods = args.methods.split(',') if args.methods else list(SquareSortGame.search_methods)
+    visited = args.visited.split(',')
+    rows = write_rows(bench(name, width, instances, methods, args.limit, visited), args.out)
+    if len(visited) > 1:
+        compare_visited(rows)
+    if args.baseline:
+        compare(rows, read_rows(args.baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+# Board
+from math import sqrt
+
+from rank import lex_rank, lex_unrank
+
+
+class Layout:
+    """Packed board encoding for one board width.
+
+    Width <= 4 packs into an int, 4 bits per tile with the tile at
+    position i in bits 4i..4i+3, and the blank position in the nibble
+    right above the last tile. Wider boards pack into bytes, one byte per
+    tile followed by one byte holding the blank position.
+    """
+
+    _cache = {}
+
+    def __init__(self, width):
+        self.width = w = width
+        self.size = n = w*w
+        self.compact = w <= 4
+        # moves[z] lists the positions the blank at z can swap with, and
+        # directions[z] the directions it moves in: 0 up, 1 down, 2 left,
+        # 3 right.
+        legal = lambda z: ((-w, z >= w), (w, z < n-w), (-1, z % w), (1, z % w != w-1))
+        self.moves = tuple( tuple(z+d for d, ok in legal(z) if ok) for z in range(n) )
+        self.directions = tuple( tuple(k for k, (_, ok) in enumerate(legal(z)) if ok)
+                                 for z in range(n) )
+        if self.compact:
+            self.zero_shift = s = 4*n
+            # steps[z] holds (position, bit offset of the position,
+            # bit offset of the blank, blank update) for each move.
+            self.steps = tuple( tuple((i, 4*i, 4*z, (i-z) << s) for i in self.moves[z])
+                                for z in range(n) )
+            self.pack = self._pack_int
+            self.unpack = self._unpack_int
+            self.zero = self._zero_int
+            self.tile = self._tile_int
+            self.slide = self._slide_int
+            self.children = self._children_int
+        else:
+            self.pack = self._pack_bytes
+            self.unpack = self._unpack_bytes
+            self.zero = self._zero_bytes
+            self.tile = self._tile_bytes
+            self.slide = self._slide_bytes
+            self.children = self._children_bytes
+        self.goal = self.pack(tuple(range(1, n)) + (0,))
+        # The goal maps onto itself under the reflection about the main
+        # diagonal, with tile t renumbered as the tile whose goal cell is
+        # the reflection of t's. transpose[i] is the reflection of cell i,
+        # relabel[t] the new number of tile t.
+        self.transpose = tuple( (i % w)*w + i//w for i in range(n) )
+        self.relabel = (0,) + tuple( self.transpose[t-1]+1 for t in range(1, n) )
+
+    @classmethod
+    def of(cls, width):
+        layout = cls._cache.get(width)
+        if layout is None:
+            layout = cls._cache[width] = cls(width)
+        return layout
+
+    # --- int encoding, width <= 4 ---
+
+    def _pack_int(self, tiles):
+        board = 0
+        for i, x in enumerate(tiles):
+            x = int(x)
+            board |= x << 4*i
+            if not x:
+                zero_at = i
+        return board | zero_at << self.zero_shift
+
+    def _unpack_int(self, board):
+        return [board >> 4*i & 15 for i in range(self.size)]
+
+    def _zero_int(self, board):
+        return board >> self.zero_shift
+
+    def _tile_int(self, board, i):
+        return board >> 4*i & 15
+
+    def _slide_int(self, board, i):
+        # Move the tile at position i into the blank.
+        z = board >> self.zero_shift
+        x = board >> 4*i & 15
+        return board + (x << 4*z) - (x << 4*i) + ((i-z) << self.zero_shift)
+
+    def _children_int(self, board, prev=-1):
+        # (tile, position, child) for every move of the blank but the one
+        # back to prev, its position on the parent board.
+        result = []
+        push = result.append
+        for i, si, sz, dz in self.steps[board >> self.zero_shift]:
+            if i == prev:
+                continue
+            x = board >> si & 15
+            push((x, i, board + (x << sz) - (x << si) + dz))
+        return result
+
+    # --- bytes encoding, width > 4 ---
+
+    def _pack_bytes(self, tiles):
+        tiles = [int(x) for x in tiles]
+        return bytes(tiles + [tiles.index(0)])
+
+    def _unpack_bytes(self, board):
+        return list(board[:-1])
+
+    def _zero_bytes(self, board):
+        return board[-1]
+
+    def _tile_bytes(self, board, i):
+        return board[i]
+
+    def _slide_bytes(self, board, i):
+        temp = bytearray(board)
+        z = temp[-1]
+        temp[z], temp[i], temp[-1] = temp[i], 0, i
+        return bytes(temp)
+
+    def _children_bytes(self, board, prev=-1):
+        result = []
+        push = result.append
+        z = board[-1]
+        for i in self.moves[z]:
+            if i == prev:
+                continue
+            temp = bytearray(board)
+            x = temp[i]
+            temp[z], temp[i], temp[-1] = x, 0, i
+            push((x, i, bytes(temp)))
+        return result
+
+    # --- permutation rank ---
+
+    def rank(self, board):
+        return lex_rank(self.unpack(board), self.size)
+
+    def unrank(self, r):
+        return self.pack(lex_unrank(r, self.size, self.size))
+
+    # --- symmetry ---
+
+    def mirror_tiles(self, tiles):
+        result = [0] * self.size
+        transpose, relabel = self.transpose, self.relabel
+        for i, x in enumerate(tiles):
+            result[transpose[i]] = relabel[x]
+        return result
+
+    def mirror(self, board):
+        """The reflected, renumbered board: same distance to the goal, and
+        its moves are the reflections of this board's moves.
+        """
+        return self.pack(self.mirror_tiles(self.unpack(board)))
+
+    def canonical(self, board):
+        # The smaller of a board and its mirror stands for both.
+        other = self.mirror(board)
+        return other if other < board else board
+
+    # --- text form ---
+
+    def parse(self, text):
+        return self.pack(text.replace(',', ' ').split())
+
+    def format(self, board):
+        return ' '.join(map(str, self.unpack(board)))
+
+    @staticmethod
+    def width_of(text):
+        return int(sqrt(len(text.replace(',', ' ').split())))
@@ -0,0 +1,127 @@
+# Solution cache
+import sqlite3
+from collections import OrderedDict
+
+from board import Layout
+
+
+class SolutionCache:
+    """Optimal solutions of packed boards, kept as one entry per board on
+    a stored path: the moves left to the goal and the blank position of
+    the next board. Any board met on an earlier optimal path is then a
+    hit, read back by following the entries to the goal.
+
+    Two tiers: an LRU dict of at most `size` entries in memory, and an
+    sqlite file at `path` shared by all widths and processes (None for
+    memory only). Entries missing from memory are read from the file and
+    promoted. A chain broken by eviction from a memory-only cache reads
+    as a miss.
+
+    A board and its mirror (Layout.mirror) share one entry under the
+    canonical board, kept in the canonical board's frame: the next blank
+    position is reflected on the way in and out for a mirrored board.
+    """
+
+    def __init__(self, width, path=None, size=1 << 16):
+        self.layout = layout = Layout.of(width)
+        self.width, self.size = width, size
+        self.memory = OrderedDict()
+        self.hits = self.misses = 0
+        if layout.compact:
+            n = (layout.zero_shift + 4 + 7) // 8
+            self.encode = lambda x: x.to_bytes(n, 'big')
+        else:
+            self.encode = bytes
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, timeout=30)
+            self.db.execute("CREATE TABLE IF NOT EXISTS solutions ("
+                            "width INTEGER, board BLOB, remaining INTEGER, next INTEGER, "
+                            "PRIMARY KEY (width, board)) WITHOUT ROWID")
+            self.db.commit()
+
+    def __len__(self):
+        return len(self.memory)
+
+    def __contains__(self, board):
+        return self.entry(board) is not None
+
+    def key(self, board):
+        return self.layout.canonical(board)
+
+    def entry(self, board):
+        # (remaining, next blank position) of a board, or None
+        key = self.key(board)
+        memory = self.memory
+        entry = memory.get(key)
+        if entry is not None:
+            memory.move_to_end(key)
+        elif self.db is not None:
+            entry = self.db.execute("SELECT remaining, next FROM solutions "
+                                    "WHERE width=? AND board=?",
+                                    (self.width, self.encode(key))).fetchone()
+            if entry is not None:
+                entry = tuple(entry)
+                self.remember(key, entry)
+        if entry is None or key == board or entry[1] < 0:
+            return entry
+        return entry[0], self.layout.transpose[entry[1]]
+
+    def remember(self, key, entry):
+        memory = self.memory
+        memory[key] = entry
+        memory.move_to_end(key)
+        if len(memory) > self.size:
+            memory.popitem(last=False)
+
+    def get(self, board):
+        """Optimal path of packed boards from board to the goal, or None."""
+        entry = self.entry(board)
+        if entry is None:
+            self.misses += 1
+            return None
+        slide, goal = self.layout.slide, self.layout.goal
+        path = [board]
+        remaining, nxt = entry
+        while remaining:
+            board = slide(board, nxt)
+            entry = self.entry(board)
+            if entry is None or entry[0] != remaining-1:
+                self.misses += 1
+                return None
+            path.append(board)
+            remaining, nxt = entry
+        if board != goal:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, path):
+        """Store an optimal path of packed boards ending at the goal. Every
+        board on it is indexed with its moves left; a shorter entry already
+        there is kept.
+        """
+        zero, transpose, last = self.layout.zero, self.layout.transpose, len(path)-1
+        rows = []
+        for i, board in enumerate(path):
+            key = self.key(board)
+            nxt = zero(path[i+1]) if i < last else -1
+            if key != board and nxt >= 0:
+                nxt = transpose[nxt]
+            entry = (last-i, nxt)
+            old = self.memory.get(key)
+            if old is None or entry[0] < old[0]:
+                self.remember(key, entry)
+            rows.append((self.width, self.encode(key)) + entry)
+        if self.db is not None:
+            self.db.executemany("INSERT INTO solutions VALUES (?, ?, ?, ?) "
+                                "ON CONFLICT (width, board) DO UPDATE SET "
+                                "remaining=excluded.remaining, next=excluded.next "
+                                "WHERE excluded.remaining < remaining", rows)
+            self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
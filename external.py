@@ -0,0 +1,132 @@
+# External-memory layer search, layers kept in files
+import os
+from heapq import merge
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from search import BreadthFirstSearch
+
+
+def record_size(layout):
+    # Bytes per packed board on disk: the int encoding big-endian, so byte
+    # order is number order, or the bytes encoding as it is.
+    if layout.compact:
+        return (layout.zero_shift + 4 + 7) // 8
+    return layout.size + 1
+
+
+def records(path, size, chunk=1 << 16):
+    """Fixed-width records of a file, read a block at a time."""
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(size*chunk)
+            if not block:
+                return
+            for i in range(0, len(block), size):
+                yield block[i:i+size]
+
+
+def fresh(runs, old):
+    """Sorted records of the sorted iterators in runs, once each, minus any
+    record found in the sorted iterators in old; all by one streaming merge.
+    """
+    tagged = [((x, 0) for x in it) for it in old] + [((x, 1) for x in it) for it in runs]
+    prev = None
+    for x, new in merge(*tagged):
+        # an old copy sorts first, so the first copy decides
+        if x != prev:
+            prev = x
+            if new:
+                yield x
+
+
+class ExternalBreadthFirstSearch(BreadthFirstSearch):
+
+    # Where layer files go (None for the system temp dir), and how many
+    # children are sorted in memory per run file.
+    directory = None
+    run_size = 1 << 20
+    OPTIONS = ('directory', 'run_size')
+
+    def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0):
+        """Level-synchronous BFS with delayed duplicate detection on disk.
+        A layer is read back from its file and its children are written
+        out as sorted runs; a k-way merge of the runs against the previous
+        two layers' files then writes the next layer, sorted and free of
+        repeats. Moves alternate the blank's colour, so a child can only
+        be new or in one of those two layers. Memory holds one run at a
+        time. Same step, path and found as BreadthFirstSearch; falls back
+        to it without a layout or with a heuristic.
+        """
+        layout = self.layout
+        if layout is None or self.heuristic is not None:
+            return super().run(start_node, depth, cap, step, found)
+        size = record_size(layout)
+        if layout.compact:
+            encode = lambda x: x.to_bytes(size, 'big')
+            decode = lambda x: int.from_bytes(x, 'big')
+        else:
+            encode = decode = bytes
+        children = layout.children
+        start_node, end_node = start_node or self.start_node, self.end_node
+        path = [start_node]
+        goal = encode(end_node)
+        root = mkdtemp(prefix='bfs-', dir=self.directory)
+        try:
+            layers = [os.path.join(root, 'layer0')]
+            with open(layers[0], 'wb') as f:
+                f.write(encode(start_node))
+            count, hit = 1, encode(start_node) == goal
+            report = self.begin()
+            generated = duplicates = widest = 0
+            while not found and (-1<step<=cap or -1<depth<=cap):
+                if step >= report:
+                    report = self.report(expansions=step, generated=generated,
+                                         duplicates=duplicates, open=widest)
+                widest = max(widest, count)
+                if hit:
+                    path.append(end_node)
+                    found = 1
+                    break
+                if not count:
+                    break
+                runs, batch = [], set()
+                for x in records(layers[-1], size):
+                    kids = children(decode(x))
+                    generated += len(kids)
+                    for _, _, child in kids:
+                        batch.add(child)
+                    if len(batch) >= self.run_size:
+                        runs.append(self.write_run(root, len(runs), batch, encode))
+                        batch = set()
+                if batch or not runs:
+                    runs.append(self.write_run(root, len(runs), batch, encode))
+                del batch
+                step += count
+                depth += 1
+                layers.append(os.path.join(root, f"layer{depth}"))
+                count, hit = 0, False
+                with open(layers[-1], 'wb') as f:
+                    write = f.write
+                    for x in fresh([records(p, size) for p in runs],
+                                   [records(p, size) for p in layers[-3:-1]]):
+                        write(x)
+                        count += 1
+                        hit = hit or x == goal
+                duplicates = generated - step - count + 1
+                for p in runs:
+                    os.remove(p)
+                if len(layers) > 3:
+                    os.remove(layers[-4])
+            self.tally(expansions=step, generated=generated, duplicates=duplicates, open=widest)
+        finally:
+            rmtree(root, ignore_errors=True)
+        self.step, self.path, self.found = self.step+step, path, bool(found)
+        return True
+
+    @staticmethod
+    def write_run(root, i, batch, encode):
+        path = os.path.join(root, f"run{i}")
+        with open(path, 'wb') as f:
+            f.write(b''.join(sorted(map(encode, batch))))
+        return path
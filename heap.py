@@ -5,21 +5,29 @@ from operator import le, lt, ge, gt
 from copy import deepcopy as dcopy, copy
 
 class Heap:
+    """Binary heap over a list, with a dict from element to its index.
 
+    Elements are kept unique: pushing an element that is already in the
+    heap does nothing, use update() or decrease_key() to change one.
+    """
+
+    __slots__ = ('data', 'dict')
     NAME = 'Heap'
 
     def __init__(self, *things):
-        self.data = deque()
+        self.data = []
         self.dict = {}
-        self += things
+        self.push_many(things)
 
     def __iadd__(self, iterable):
-        for x in iterable:
-            self.append(x)
+        self.push_many(iterable)
         return self
 
     def copy(self):
-        return copy(self)
+        new = self.__class__()
+        new.data = self.data.copy()
+        new.dict = self.dict.copy()
+        return new
 
     def deepcopy(self):
         return dcopy(self)
@@ -27,6 +35,9 @@ class Heap:
     def __len__(self):
         return self.data.__len__()
 
+    def __contains__(self, x):
+        return x in self.dict
+
     def __iter__(self):
         new = self.copy()
         while new:
@@ -71,36 +82,61 @@ class Heap:
             return '\n'.join(f"{row:<{graph_width}}" for row in stack)
 
     def append(self, x):
-        self.data.append(x)
-        idx = self.data.__len__() - 1
-        self.dict[x] = idx
-        self.up(idx)
+        dic = self.dict
+        if x in dic:
+            return None
+        data = self.data
+        dic[x] = len(data)
+        data.append(x)
+        self.up(len(data)-1)
+
+    # A heap has no front to push to, only a top.
+    appendleft = append
 
-    def appendleft(self, x):
-        self.data.appendleft(x)
-        self.dict[x] = 0
-        self.down([0])
+    def push_many(self, iterable):
+        data, dic = self.data, self.dict
+        n = len(data)
+        for x in iterable:
+            if x not in dic:
+                dic[x] = len(data)
+                data.append(x)
+        added = len(data) - n
+        if added > n:
+            # Bottom-up heapify is O(n), cheaper than sifting each one up.
+            for i in range(len(data)//2 - 1, -1, -1):
+                self.down(i)
+        else:
+            for i in range(n, len(data)):
+                self.up(i)
 
     def pop(self):
+        # Remove the last element of the array, which is always a leaf.
         x = self.data.pop()
         del self.dict[x]
-        # TODO: potential bug if there are multiple entries for the same key
         return x
 
     def popleft(self):
-        # Must have at least one element to pop()
-        data = self.data
-        dic = self.dict
-        if len(data) >= 1:
-            data[0], data[-1] = data[-1], data[0]
-            dic[data[0]] = 0
-            del dic[data[-1]]
-            out = data.pop()
-            if len(data) > 0:
-                self.down(0)
-            return out
-        else:
+        data, dic = self.data, self.dict
+        if not data:
             raise IndexError("Heap is empty.")
+        top = data[0]
+        del dic[top]
+        last = data.pop()
+        if data:
+            data[0] = last
+            dic[last] = 0
+            self.down(0)
+        return top
+
+    def remove(self, x):
+        data, dic = self.data, self.dict
+        i = dic.pop(x)
+        last = data.pop()
+        if i < len(data):
+            data[i] = last
+            dic[last] = i
+            self.up(i)
+            self.down(dic[last])
 
     def up(self, child_i):
         data = self.data
@@ -109,7 +145,7 @@ class Heap:
         child_v = data[child_i]
         # If index i == 0, no need to do anthing.
         while child_i > 0:
-            parent_i = (child_i-1)//2
+            parent_i = (child_i-1) >> 1
             parent_v = data[parent_i]
             if compare(child_v, parent_v):
                 data[child_i] = parent_v
@@ -122,65 +158,142 @@ class Heap:
         dic[child_v] = child_i
 
     def down(self, parent_i):
-        compare = self.DOWN_COMPARE
         data = self.data
         dic = self.dict
-        end = len(data)-1
-        if parent_i == end:
-            return None
-        if parent_i > end:
+        compare = self.UP_COMPARE
+        end = len(data)
+        if parent_i >= end:
             raise IndexError(f"This index exceed the length: {parent_i}")
         parent_v = data[parent_i]
-        child_i = parent_i
         while True:
-            lchild_i = parent_i*2+1
-            rchild_i = lchild_i+1
-            # Child may not exist for one node, check before getting the value
-            # If Right Exist, this means that Left exist.
-            # Reversely if Left do not exist, there is no Right.
-            if lchild_i <= end:
-                lchild_v = data[lchild_i]
-                # We do not sure to swap with L or R
-                if rchild_i <= end:
-                    rchild_v = data[rchild_i]
-                    if compare(lchild_v, rchild_v) and compare(parent_v, rchild_v):
-                        child_i = rchild_i
-                        data[parent_i] = rchild_v
-                        dic[rchild_v] = parent_i
-                        parent_i = child_i
-                        continue
-                # Can only swap with L
-                if compare(parent_v, lchild_v):
-                    child_i = lchild_i
-                    data[parent_i] = lchild_v
-                    dic[lchild_v] = parent_i
-                    parent_i = child_i
-                    continue
-            break
-        data[child_i] = parent_v
-        dic[parent_v] = child_i
+            child_i = parent_i*2+1
+            if child_i >= end:
+                break
+            # Pick the child that should sit higher, R only if it exists.
+            rchild_i = child_i+1
+            if rchild_i < end and compare(data[rchild_i], data[child_i]):
+                child_i = rchild_i
+            child_v = data[child_i]
+            if not compare(child_v, parent_v):
+                break
+            data[parent_i] = child_v
+            dic[child_v] = parent_i
+            parent_i = child_i
+        data[parent_i] = parent_v
+        dic[parent_v] = parent_i
 
     def update(self, old_v, new_v):
         dic = self.dict
-        old_i = dic[old_v]
-        del dic[old_v]
+        if new_v in dic and new_v != old_v:
+            # new_v is queued already, just drop the old entry.
+            self.remove(old_v)
+            return None
+        old_i = dic.pop(old_v)
         dic[new_v] = old_i
         self.data[old_i] = new_v
-        if self.DOWN_COMPARE(new_v, old_v):
-            self.down(old_i)
-        else:
+        if self.UP_COMPARE(new_v, old_v):
             self.up(old_i)
+        else:
+            self.down(old_i)
+
+    def decrease_key(self, old_v, new_v):
+        # Only ever moves an element towards the top.
+        if self.UP_COMPARE(new_v, old_v):
+            self.update(old_v, new_v)
 
 
 class MaxHeap(Heap):
 
+    __slots__ = ()
     NAME = "MaxHeap"
     UP_COMPARE = gt
-    DOWN_COMPARE = lt
 
 
 class MinHeap(Heap):
     
+    __slots__ = ()
     NAME = "MinHeap"
     UP_COMPARE = lt
-    DOWN_COMPARE = gt
\ No newline at end of file
+
+def _priority(x):
+    # (f, h) for an (f, State) pair, (value, 0) for a State.
+    f, rest = x
+    return (f, rest[0]) if isinstance(rest, tuple) else (f, 0)
+
+
+class BucketQueue:
+    """Priority queue for small non-negative integer priorities.
+
+    buckets[f][tie] is a LIFO stack. key(x) gives (f, tie); by default
+    items are States, ordered by value, or (f, State) pairs with ties
+    going to the lower State value. Equal items are not merged, a changed
+    priority is pushed again and the stale entry left for the caller to
+    skip.
+
+    low is the lowest f that may hold items, and ties[f] the lowest tie
+    in bucket f that may. A pop starts at the cursors and only moves them
+    forward past empty stacks; a push only moves them back to itself. So
+    a pop costs O(1) plus the empty stacks it skips, each skipped once per
+    push below it: amortized O(1) while priorities stay within a bounded
+    range of the lowest one, as f and h do in A*.
+    """
+
+    __slots__ = ('buckets', 'ties', 'key', 'low', 'size')
+    NAME = 'BucketQueue'
+
+    def __init__(self, *things, key=None):
+        self.buckets = []
+        self.ties = []
+        self.key = key or _priority
+        self.low = 0
+        self.size = 0
+        self.push_many(things)
+
+    def __iadd__(self, iterable):
+        self.push_many(iterable)
+        return self
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return f"{self.NAME}({self.size})"
+
+    def append(self, x):
+        f, tie = self.key(x)
+        buckets, ties = self.buckets, self.ties
+        while len(buckets) <= f:
+            buckets.append([])
+            ties.append(0)
+        bucket = buckets[f]
+        while len(bucket) <= tie:
+            bucket.append([])
+        bucket[tie].append(x)
+        if tie < ties[f]:
+            ties[f] = tie
+        if f < self.low or not self.size:
+            self.low = f
+        self.size += 1
+
+    appendleft = append
+
+    def push_many(self, iterable):
+        for x in iterable:
+            self.append(x)
+
+    def popleft(self):
+        if not self.size:
+            raise IndexError("BucketQueue is empty.")
+        buckets, ties = self.buckets, self.ties
+        f = self.low
+        while True:
+            bucket = buckets[f]
+            tie = ties[f]
+            while tie < len(bucket) and not bucket[tie]:
+                tie += 1
+            ties[f] = tie
+            if tie < len(bucket):
+                self.low = f
+                self.size -= 1
+                return bucket[tie].pop()
+            f += 1
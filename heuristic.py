@@ -0,0 +1,249 @@
+# Heuristic
+from board import Layout
+
+
+class Heuristic:
+    """Heuristic built once per board width.
+
+    Calling it scores a packed board from scratch, evaluate() does the same
+    for a list of tiles. update() returns the score of a child from its
+    parent's score, given that `tile` just slid from position `src` into
+    the blank at `dst`; update_tiles() is the same for a tile list that
+    has already been changed in place.
+    """
+
+    NAME = 'Heuristic'
+    _cache = {}
+
+    def __init__(self, width):
+        self.layout = Layout.of(width)
+        self.width = width
+
+    @classmethod
+    def of(cls, width):
+        key = (cls, width)
+        h = cls._cache.get(key)
+        if h is None:
+            h = cls._cache[key] = cls(width)
+        return h
+
+    def __call__(self, board):
+        return self.evaluate(self.layout.unpack(board))
+
+    def evaluate(self, tiles):
+        raise NotImplementedError
+
+    def update(self, h, board, tile, src, dst):
+        return self(board)
+
+    def update_tiles(self, h, tiles, tile, src, dst):
+        return self.evaluate(tiles)
+
+    def __repr__(self):
+        return f"{self.NAME}({self.width})"
+
+
+class TileHeuristic(Heuristic):
+    """Sum of per-tile costs, looked up in a flat table at tile*size+position.
+    A move changes one tile's position, so update() is a two-entry delta.
+    """
+
+    def __init__(self, width):
+        super().__init__(width)
+        n = self.layout.size
+        self.table = table = [0] * (n*n)
+        for tile in range(1, n):
+            for pos in range(n):
+                table[tile*n+pos] = self.cost(tile, pos)
+
+    def cost(self, tile, pos):
+        return 0
+
+    def evaluate(self, tiles):
+        table, n = self.table, self.layout.size
+        return sum(table[x*n+i] for i, x in enumerate(tiles))
+
+    def update(self, h, board, tile, src, dst):
+        table, k = self.table, tile*self.layout.size
+        return h - table[k+src] + table[k+dst]
+
+    update_tiles = update
+
+
+class Hamming(TileHeuristic):
+
+    NAME = 'Hamming'
+
+    def cost(self, tile, pos):
+        return int(pos != tile-1)
+
+
+class Manhattan(TileHeuristic):
+
+    NAME = 'Manhattan'
+
+    def cost(self, tile, pos):
+        w, goal = self.width, tile-1
+        return abs(pos//w - goal//w) + abs(pos%w - goal%w)
+
+
+class Hybrid(TileHeuristic):
+
+    NAME = 'Hybrid'
+
+    def cost(self, tile, pos):
+        return Hamming.cost(self, tile, pos) + Manhattan.cost(self, tile, pos)
+
+
+def _longest_increasing(seq):
+    best = [1] * len(seq)
+    for i, x in enumerate(seq):
+        for j in range(i):
+            if seq[j] < x and best[j] >= best[i]:
+                best[i] = best[j] + 1
+    return max(best, default=0)
+
+
+class _Conflicts(dict):
+
+    def __missing__(self, key):
+        self[key] = cost = 2*(len(key) - _longest_increasing(key))
+        return cost
+
+
+class LinearConflict(Manhattan):
+    """Manhattan plus 2 for every tile that has to leave its goal row or
+    column to let reversed tiles pass, i.e. 2 * (k - longest in-order run)
+    over the k tiles of a line that belong to it. Line costs are looked up
+    by the goal offsets of those tiles, in a table kept once per width and
+    filled as line contents are first seen.
+    """
+
+    NAME = 'LinearConflict'
+
+    def __init__(self, width):
+        super().__init__(width)
+        w = width
+        self.conflicts = _Conflicts()
+        self.rows = [tuple(range(r*w, r*w+w)) for r in range(w)]
+        self.cols = [tuple(range(c, w*w, w)) for c in range(w)]
+
+    def row_conflict(self, tiles, r):
+        w = self.width
+        return self.conflicts[tuple( (x-1) % w for x in (tiles[i] for i in self.rows[r])
+                                     if x and (x-1)//w == r )]
+
+    def col_conflict(self, tiles, c):
+        w = self.width
+        return self.conflicts[tuple( (x-1)//w for x in (tiles[i] for i in self.cols[c])
+                                     if x and (x-1) % w == c )]
+
+    def evaluate(self, tiles):
+        w = self.width
+        return ( super().evaluate(tiles)
+                 + sum(self.row_conflict(tiles, r) for r in range(w))
+                 + sum(self.col_conflict(tiles, c) for c in range(w)) )
+
+    def update_tiles(self, h, tiles, tile, src, dst):
+        # Only the lines the tile left and entered across the move change.
+        w = self.width
+        h = Manhattan.update(self, h, None, tile, src, dst)
+        if src//w == dst//w:
+            lines, conflict = (src % w, dst % w), self.col_conflict
+        else:
+            lines, conflict = (src//w, dst//w), self.row_conflict
+        tiles[src], tiles[dst] = tile, 0
+        h -= conflict(tiles, lines[0]) + conflict(tiles, lines[1])
+        tiles[src], tiles[dst] = 0, tile
+        return h + conflict(tiles, lines[0]) + conflict(tiles, lines[1])
+
+    def update(self, h, board, tile, src, dst):
+        return self.update_tiles(h, self.layout.unpack(board), tile, src, dst)
+
+
+class WalkingDistance(Heuristic):
+    """Walking distance: the vertical part counts, for each row, how many
+    tiles belong to each goal row and asks how many blank moves it takes
+    to sort them; the horizontal part does the same for columns. Both use
+    one table, built on first use by breadth-first search from the goal
+    counts. The table grows too fast past 4x4 to build.
+    """
+
+    NAME = 'WalkingDistance'
+    MAX_WIDTH = 4
+
+    def __init__(self, width):
+        super().__init__(width)
+        self.table = None
+
+    def load(self):
+        if self.width > self.MAX_WIDTH:
+            raise ValueError(f"No walking distance table for width {self.width}.")
+        self.table = self.build(self.width)
+        return self.table
+
+    @staticmethod
+    def build(width):
+        w = width
+        goal = [0] * (w*w)
+        for i in range(w):
+            goal[i*w+i] = w
+        goal[-1] -= 1
+        start = tuple(goal) + (w-1,)
+        table = {start: 0}
+        frontier = [start]
+        depth = 0
+        while frontier:
+            depth += 1
+            later = []
+            for key in frontier:
+                b = key[-1]
+                for a in (b-1, b+1):
+                    if not 0 <= a < w:
+                        continue
+                    for j in range(w):
+                        if key[a*w+j]:
+                            temp = list(key)
+                            temp[a*w+j] -= 1
+                            temp[b*w+j] += 1
+                            temp[-1] = a
+                            temp = tuple(temp)
+                            if temp not in table:
+                                table[temp] = depth
+                                later.append(temp)
+            frontier = later
+        return table
+
+    def vertical(self, tiles):
+        w = self.width
+        counts = [0] * (w*w+1)
+        for i, x in enumerate(tiles):
+            if x:
+                counts[i//w*w + (x-1)//w] += 1
+            else:
+                counts[-1] = i//w
+        return (self.table or self.load())[tuple(counts)]
+
+    def horizontal(self, tiles):
+        w = self.width
+        counts = [0] * (w*w+1)
+        for i, x in enumerate(tiles):
+            if x:
+                counts[i % w*w + (x-1) % w] += 1
+            else:
+                counts[-1] = i % w
+        return (self.table or self.load())[tuple(counts)]
+
+    def evaluate(self, tiles):
+        return self.vertical(tiles) + self.horizontal(tiles)
+
+    def update_tiles(self, h, tiles, tile, src, dst):
+        # A vertical move only changes the row counts and vice versa.
+        part = self.horizontal if src//self.width == dst//self.width else self.vertical
+        tiles[src], tiles[dst] = tile, 0
+        h -= part(tiles)
+        tiles[src], tiles[dst] = 0, tile
+        return h + part(tiles)
+
+    def update(self, h, board, tile, src, dst):
+        return self.update_tiles(h, self.layout.unpack(board), tile, src, dst)
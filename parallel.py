@@ -0,0 +1,134 @@
+# Parallel layer search over worker processes
+from multiprocessing import Pipe, Process
+from os import cpu_count
+from zlib import crc32
+
+from board import Layout
+from rank import RankedSet
+from search import BreadthFirstSearch
+
+
+def shard(board, parts):
+    """Partition of a packed board, the same in every process. Int hashes
+    are not salted, bytes hashes are, so bytes boards go through crc32.
+    """
+    if isinstance(board, int):
+        return hash((board,)) % parts
+    return crc32(board) % parts
+
+
+def _worker(conn, width, k, parts, end_node, visited, others=()):
+    # Owns the boards of partition k: their visited set, the part of the
+    # current layer that falls in it, and the children it made for itself.
+    # Copies of the search's pipe ends left over from fork are closed, so
+    # every pipe breaks once the search process goes away.
+    for other in others:
+        other.close()
+    layout = Layout.of(width)
+    children = layout.children
+    memory = RankedSet(layout) if visited == 'bitset' else set()
+    layer, own = set(), set()
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            if message[0] == 'merge':
+                own.update(message[1])
+                layer, own = own - memory, set()
+                memory.update(layer)
+                conn.send((len(layer), end_node in layer))
+            else:
+                buckets = [set() for _ in range(parts)]
+                made = 0
+                for board in layer:
+                    kids = children(board)
+                    made += len(kids)
+                    for _, _, child in kids:
+                        buckets[shard(child, parts)].add(child)
+                layer, own = set(), buckets[k] - memory
+                buckets[k] = None
+                # other partitions' boards are never in this memory
+                conn.send((made, [None if x is None else list(x) for x in buckets]))
+    except (EOFError, OSError):
+        # the search process is gone
+        pass
+    conn.close()
+
+
+class ParallelBreadthFirstSearch(BreadthFirstSearch):
+
+    # Worker processes, None for one per CPU.
+    workers = None
+    OPTIONS = ('workers',)
+
+    def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0, workers=None):
+        """Level-synchronous BFS with the boards split over worker processes
+        by shard(). Each worker dedupes and expands its own part of a layer;
+        only children owned by another worker pass through here on their way
+        to it. Same step, path and found as BreadthFirstSearch, which it
+        falls back to without a layout or with a heuristic.
+        """
+        layout = self.layout
+        if layout is None or self.heuristic is not None:
+            return super().run(start_node, depth, cap, step, found)
+        parts = workers or self.workers or cpu_count() or 1
+        start_node, end_node = start_node or self.start_node, self.end_node
+        path = [start_node]
+        inbox = [[] for _ in range(parts)]
+        inbox[shard(start_node, parts)].append(start_node)
+        pipes, procs = [], []
+        try:
+            for k in range(parts):
+                here, there = Pipe()
+                proc = Process(target=_worker, daemon=True,
+                               args=(there, layout.width, k, parts, end_node, self.visited,
+                                     pipes + [here]))
+                proc.start()
+                there.close()
+                pipes.append(here)
+                procs.append(proc)
+            report = self.begin()
+            generated = duplicates = widest = kept = 0
+            while not found and (-1<step<=cap or -1<depth<=cap):
+                if step >= report:
+                    report = self.report(expansions=step, generated=generated,
+                                         duplicates=duplicates, open=widest, closed=kept)
+                for conn, boards in zip(pipes, inbox):
+                    conn.send(('merge', boards))
+                replies = [conn.recv() for conn in pipes]
+                diff = sum(n for n, _ in replies)
+                widest = max(widest, diff)
+                # Every board but the start is a child kept once.
+                kept += diff
+                duplicates = generated - kept + 1
+                if any(hit for _, hit in replies):
+                    path.append(end_node)
+                    found = 1
+                    break
+                if not diff:
+                    break
+                for conn in pipes:
+                    conn.send(('expand',))
+                inbox = [[] for _ in range(parts)]
+                for conn in pipes:
+                    made, outbox = conn.recv()
+                    generated += made
+                    for box, boards in zip(inbox, outbox):
+                        if boards:
+                            box.extend(boards)
+                step += diff
+                depth += 1
+            self.tally(expansions=step, generated=generated, duplicates=duplicates,
+                       open=widest, closed=kept)
+        finally:
+            for conn in pipes:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+                conn.close()
+            for proc in procs:
+                proc.join()
+        self.step, self.path, self.found = self.step+step, path, bool(found)
+        return True
@@ -0,0 +1,265 @@
+# Pattern databases
+import mmap
+import os
+from array import array
+from sys import argv
+
+from board import Layout
+from heuristic import Heuristic
+from rank import lex_rank as rank, lex_unrank as unrank
+
+
+# Disjoint tile groups per width. Every tile belongs to exactly one group,
+# so the group distances add up to an admissible estimate.
+PARTITIONS = {
+    2: ((1, 2, 3),),
+    3: ((1, 2, 3, 4), (5, 6, 7, 8)),
+    4: ((1, 5, 6, 9, 10, 13), (7, 8, 11, 12, 14, 15), (2, 3, 4)),
+    }
+
+UNKNOWN = 255
+
+
+def cache_dir():
+    path = os.environ.get('SQUARESORTGAME_CACHE') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'SquareSortGame')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def n_entries(k, n):
+    total = 1
+    for i in range(k):
+        total *= n-i
+    return total
+
+
+def build(width, pattern):
+    """Distance table of one pattern, by 0-1 breadth-first search backward
+    from the goal. Only moves of pattern tiles cost 1, the other tiles are
+    indistinguishable, and each entry keeps the minimum over all blank
+    positions. Slow in pure Python for 6+ tiles on 4x4, but done once.
+    """
+    layout = Layout.of(width)
+    n, k = layout.size, len(pattern)
+    moves = layout.moves
+    table = bytearray([UNKNOWN]) * n_entries(k, n)
+    done = bytearray(len(table) * n)
+    goal = [t-1 for t in pattern]
+    current = array('q', [rank(goal, n)*n + n-1])
+    depth = 0
+    while current:
+        later = array('q')
+        push_now, push_later = current.append, later.append
+        i = 0
+        while i < len(current):
+            idx = current[i]
+            i += 1
+            if done[idx]:
+                continue
+            done[idx] = 1
+            r, z = divmod(idx, n)
+            if table[r] == UNKNOWN:
+                table[r] = depth
+            positions = unrank(r, k, n)
+            for p in moves[z]:
+                if p in positions:
+                    j = positions.index(p)
+                    positions[j] = z
+                    nxt = rank(positions, n)*n + p
+                    positions[j] = p
+                    if not done[nxt]:
+                        push_later(nxt)
+                else:
+                    nxt = r*n + p
+                    if not done[nxt]:
+                        push_now(nxt)
+        current = later
+        depth += 1
+    return table
+
+
+def path_of(width, pattern):
+    name = '-'.join(map(str, pattern))
+    return os.path.join(cache_dir(), f"pdb_w{width}_{name}.bin")
+
+
+def load(width, pattern):
+    """Memory-map a pattern table, building and saving it first if needed.
+    Mapped pages are shared between processes reading the same file.
+    """
+    path = path_of(width, pattern)
+    if not os.path.exists(path):
+        table = build(width, pattern)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, 'wb') as f:
+            f.write(table)
+        os.replace(temp, path)
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class PatternDatabase(Heuristic):
+    """Additive disjoint pattern database. Tables load on first use.
+
+    With mirror set, the estimate is the larger of the board's and its
+    mirror's (Layout.mirror). Both are admissible, as the two boards are
+    the same distance from the goal, and the partitions are not symmetric,
+    so the second lookup sees the board through different groups. The
+    maximum cannot be carried by a delta, so update() rescores.
+    """
+
+    NAME = 'PatternDatabase'
+
+    def __init__(self, width, partition=None, mirror=True):
+        super().__init__(width)
+        self.mirror = mirror
+        # Widths without a default partition fail on first use, not here:
+        # the game builds every heuristic of its width up front.
+        partition = partition or PARTITIONS.get(width, ())
+        self.partition = tuple(tuple(p) for p in partition)
+        n = self.layout.size
+        self.owner = owner = [None] * n
+        for i, pattern in enumerate(self.partition):
+            for t in pattern:
+                owner[t] = i
+        self.tables = None
+
+    def load(self):
+        if not self.partition:
+            raise ValueError(f"No default pattern partition for width {self.width}.")
+        self.tables = [load(self.width, p) for p in self.partition]
+        return self.tables
+
+    def lookup(self, tiles):
+        tables = self.tables or self.load()
+        n = self.layout.size
+        where = [0] * n
+        for i, x in enumerate(tiles):
+            where[x] = i
+        return sum( table[rank([where[t] for t in pattern], n)]
+                    for table, pattern in zip(tables, self.partition) )
+
+    def evaluate(self, tiles):
+        h = self.lookup(tiles)
+        if self.mirror:
+            h = max(h, self.lookup(self.layout.mirror_tiles(tiles)))
+        return h
+
+    def update_tiles(self, h, tiles, tile, src, dst):
+        if self.mirror:
+            return self.evaluate(tiles)
+        k = self.owner[tile]
+        if k is None:
+            return h
+        table = (self.tables or self.load())[k]
+        pattern, n = self.partition[k], self.layout.size
+        positions = [tiles.index(t) for t in pattern]
+        new = rank(positions, n)
+        positions[pattern.index(tile)] = src
+        return h - table[rank(positions, n)] + table[new]
+
+    def update(self, h, board, tile, src, dst):
+        return self.update_tiles(h, self.layout.unpack(board), tile, src, dst)
+
+
+class DistanceTable(Heuristic):
+    """Exact distance to the goal of every board, by breadth-first search
+    backward from the goal over the whole state space. One byte per
+    board, cached on disk and memory-mapped like the pattern tables. Only
+    practical up to 3x3.
+
+    A board and its mirror (Layout.mirror) are the same distance from the
+    goal, so only boards with the blank on or below the main diagonal are
+    stored, the others being looked up as their mirror: 6 of 9 blank
+    cells, 8! entries each, on 3x3. The search runs over one board of
+    each pair.
+    """
+
+    NAME = 'DistanceTable'
+    MAX_WIDTH = 3
+
+    def __init__(self, width):
+        super().__init__(width)
+        w, n = width, self.layout.size
+        # slot[z]: block of the table for the blank at z, None above the
+        # diagonal
+        cells = [z for z in range(n) if z//w >= z % w]
+        self.slot = [None] * n
+        for i, z in enumerate(cells):
+            self.slot[z] = i
+        self.block = n_entries(n-1, n-1)
+        self.entries = len(cells) * self.block
+        self.table = None
+
+    def path(self):
+        return os.path.join(cache_dir(), f"dist_w{self.width}_mirror.bin")
+
+    def fold(self, tiles):
+        # The board or its mirror: the one with the blank below the
+        # diagonal, or the smaller with the blank on it, so that the
+        # search meets each pair once.
+        z = tiles.index(0)
+        w = self.width
+        if z//w > z % w:
+            return tiles
+        other = self.layout.mirror_tiles(tiles)
+        return other if z//w < z % w or other < tiles else tiles
+
+    def index(self, tiles):
+        n = self.layout.size - 1
+        return ( self.slot[tiles.index(0)] * self.block +
+                 rank([x-1 for x in tiles if x], n) )
+
+    def build(self):
+        layout = self.layout
+        pack, unpack, children = layout.pack, layout.unpack, layout.children
+        fold, index = self.fold, self.index
+        table = bytearray([UNKNOWN]) * self.entries
+        table[index(unpack(layout.goal))] = 0
+        frontier = [layout.goal]
+        depth = 0
+        while frontier:
+            depth += 1
+            later = []
+            for board in frontier:
+                for _, _, child in children(board):
+                    tiles = fold(unpack(child))
+                    r = index(tiles)
+                    if table[r] == UNKNOWN:
+                        table[r] = depth
+                        later.append(pack(tiles))
+            frontier = later
+        return table
+
+    def load(self):
+        if self.width > self.MAX_WIDTH:
+            raise ValueError(f"No distance table for width {self.width}.")
+        path = self.path()
+        if not os.path.exists(path):
+            temp = f"{path}.{os.getpid()}.tmp"
+            with open(temp, 'wb') as f:
+                f.write(self.build())
+            os.replace(temp, path)
+        with open(path, 'rb') as f:
+            self.table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.table
+
+    def evaluate(self, tiles):
+        return (self.table or self.load())[self.index(self.fold(list(tiles)))]
+
+    def update_tiles(self, h, tiles, tile, src, dst):
+        return self.evaluate(tiles)
+
+
+if __name__ == '__main__':
+    # python patterndb.py WIDTH  -> build the default tables ahead of time
+    for width in map(int, argv[1:] or ['3']):
+        if width <= DistanceTable.MAX_WIDTH:
+            db = DistanceTable(width)
+            print(f"width {width}, distance table: {db.path()}")
+            db.load().close()
+        db = PatternDatabase(width)
+        for pattern in db.partition:
+            print(f"width {width}, pattern {pattern}: {path_of(width, pattern)}")
+            load(width, pattern).close()
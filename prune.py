@@ -0,0 +1,104 @@
+# Move pruning by a finite-state machine over blank directions
+from collections import deque
+
+
+# Blank directions, in the order of Layout.directions: up, down, left, right.
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+
+def redundant(depth):
+    """Move strings (tuples of directions) of at most `depth` moves that a
+    search can skip, none containing another. A string is redundant when
+    an earlier string (shorter, or as long and lexically smaller) leaves
+    the same board, and that string's blank stays inside the box the
+    redundant one's blank covers: wherever the redundant string can be
+    played, so can its replacement. Found breadth first on an unbounded
+    board, where a board is the blank's cell and the tiles out of place.
+    """
+    found = []
+    boxes = {((0, 0), frozenset()): [(0, 0, 0, 0)]}
+    layer = [((), (0, 0), {}, (0, 0, 0, 0))]
+    banned = set()
+    for length in range(1, depth+1):
+        later = []
+        for moves, blank, moved, box in layer:
+            x, y = blank
+            for d, (dx, dy) in enumerate(DIRECTIONS):
+                seq = moves + (d,)
+                # strings with a redundant tail are never reached
+                if any(seq[i:] in banned for i in range(len(seq)-1)):
+                    continue
+                cell = (x+dx, y+dy)
+                tiles = dict(moved)
+                # the tile at cell moves into the blank's cell
+                tile = tiles.pop(cell, cell)
+                # a tile's home is its label; tiles at home are left out
+                if tile != blank:
+                    tiles[blank] = tile
+                area = (min(box[0], cell[0]), min(box[1], cell[1]),
+                        max(box[2], cell[0]), max(box[3], cell[1]))
+                state = (cell, frozenset(tiles.items()))
+                seen = boxes.setdefault(state, [])
+                if any( a[0] >= area[0] and a[1] >= area[1] and
+                        a[2] <= area[2] and a[3] <= area[3] for a in seen ):
+                    banned.add(seq)
+                    found.append(seq)
+                    continue
+                seen.append(area)
+                later.append((seq, cell, tiles, area))
+        layer = later
+    return found
+
+
+class MovePruner:
+    """Aho-Corasick automaton over the redundant strings of redundant():
+    table[s][d] is the state after moving the blank in direction d from
+    state s, or -1 when that move ends a redundant string. Start in
+    state 0. Depth 2 rules out just undoing the last move.
+    """
+
+    _cache = {}
+
+    def __init__(self, depth):
+        self.depth = depth
+        self.patterns = redundant(depth)
+        goto, dead = [[None]*4], [False]
+        for seq in self.patterns:
+            s = 0
+            for d in seq:
+                if goto[s][d] is None:
+                    goto[s][d] = len(goto)
+                    goto.append([None]*4)
+                    dead.append(False)
+                s = goto[s][d]
+            dead[s] = True
+        # complete the goto function along failure links, breadth first
+        fail = [0] * len(goto)
+        queue = deque()
+        for d in range(4):
+            t = goto[0][d]
+            if t is None:
+                goto[0][d] = 0
+            else:
+                queue.append(t)
+        while queue:
+            s = queue.popleft()
+            dead[s] = dead[s] or dead[fail[s]]
+            for d in range(4):
+                t = goto[s][d]
+                if t is None:
+                    goto[s][d] = goto[fail[s]][d]
+                else:
+                    fail[t] = goto[fail[s]][d]
+                    queue.append(t)
+        self.table = tuple( tuple(-1 if dead[t] else t for t in row) for row in goto )
+
+    @classmethod
+    def of(cls, depth):
+        pruner = cls._cache.get(depth)
+        if pruner is None:
+            pruner = cls._cache[depth] = cls(depth)
+        return pruner
+
+    def __len__(self):
+        return len(self.table)
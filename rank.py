@@ -0,0 +1,125 @@
+# Permutation ranking and rank-indexed storage
+from math import factorial
+
+
+def lex_rank(seq, n):
+    """Lexicographic index of an ordered selection of distinct values out
+    of range(n); a full permutation when len(seq) == n. Linear in len(seq),
+    counting the smaller values already used with one popcount each.
+    """
+    r, used = 0, 0
+    for i, p in enumerate(seq):
+        r = r*(n-i) + p - (used & ((1 << p)-1)).bit_count()
+        used |= 1 << p
+    return r
+
+
+def lex_unrank(r, k, n):
+    digits = []
+    for i in range(k-1, -1, -1):
+        r, d = divmod(r, n-i)
+        digits.append(d)
+    free = list(range(n))
+    return [free.pop(d) for d in reversed(digits)]
+
+
+# Most cells a board may have for the rank-indexed stores: they are dense
+# tables over all n! ranks, 45 KiB of bits or 354 KiB of bytes for 3x3.
+# 16! bits would be 2.6 TB, and paging does not rescue 4x4 either: the
+# ranks of the boards a search meets are spread over the whole range, so
+# nearly every board lands on a page of its own.
+MAX_SIZE = 9
+
+
+def n_ranks(layout):
+    if layout.size > MAX_SIZE:
+        raise ValueError(f"Rank-indexed storage only goes up to {MAX_SIZE} cells, "
+                         f"not {layout.width}x{layout.width}; use visited='set'.")
+    return factorial(layout.size)
+
+
+class Bitset:
+    """n bits, indexed by rank, in one bytearray."""
+
+    __slots__ = ('bits', 'count')
+
+    def __init__(self, n):
+        self.bits = bytearray((n+7) >> 3)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, i):
+        return bool(self.bits[i >> 3] >> (i & 7) & 1)
+
+    def add(self, i):
+        bits = self.bits
+        bit = 1 << (i & 7)
+        if not bits[i >> 3] & bit:
+            bits[i >> 3] |= bit
+            self.count += 1
+
+
+class RankedSet:
+    """Visited set of packed boards kept as one bit per permutation rank.
+    Boards up to MAX_SIZE cells.
+    """
+
+    __slots__ = ('bits', 'rank')
+
+    def __init__(self, layout, boards=()):
+        self.bits = Bitset(n_ranks(layout))
+        self.rank = layout.rank
+        self.update(boards)
+
+    def __len__(self):
+        return len(self.bits)
+
+    def __contains__(self, board):
+        return self.rank(board) in self.bits
+
+    def __rsub__(self, boards):
+        # set(boards) - visited
+        bits, rank = self.bits, self.rank
+        return {x for x in boards if rank(x) not in bits}
+
+    def add(self, board):
+        self.bits.add(self.rank(board))
+
+    def update(self, boards):
+        add, rank = self.bits.add, self.rank
+        for board in boards:
+            add(rank(board))
+
+
+class ParentLinks:
+    """Parent of each packed board, stored as the parent's blank position
+    plus one in a byte per rank: the parent is the board with the blank
+    slid back there. A board linked to itself reads back as itself.
+    Boards up to MAX_SIZE cells.
+    """
+
+    __slots__ = ('codes', 'rank', 'zero', 'slide')
+
+    def __init__(self, layout, links=()):
+        self.codes = bytearray(n_ranks(layout))
+        self.rank, self.zero, self.slide = layout.rank, layout.zero, layout.slide
+        self.update(links)
+
+    def __contains__(self, board):
+        return bool(self.codes[self.rank(board)])
+
+    def __getitem__(self, board):
+        code = self.codes[self.rank(board)]
+        if not code:
+            raise KeyError(board)
+        return self.slide(board, code-1)
+
+    def __setitem__(self, board, parent):
+        self.codes[self.rank(board)] = self.zero(parent)+1
+
+    def update(self, links):
+        items = links.items() if hasattr(links, 'items') else links
+        for board, parent in items:
+            self[board] = parent
@@ -0,0 +1,108 @@
+# Scrambled boards in bulk
+import random
+from itertools import count as counter
+
+from board import Layout
+
+
+def inversions(tiles):
+    """Pairs of non-blank tiles out of order, counted right to left with a
+    Fenwick tree over tile numbers: O(n log n).
+    """
+    tree = [0] * (len(tiles)+1)
+    total = 0
+    for x in reversed(tiles):
+        if not x:
+            continue
+        i = x - 1
+        while i:
+            total += tree[i]
+            i &= i-1
+        i = x
+        while i < len(tree):
+            tree[i] += 1
+            i += i & -i
+    return total
+
+
+def solvable(tiles, width=None):
+    """Whether tiles can reach the goal (blank last). On odd widths the
+    inversion count must be even. On even widths a vertical move also
+    flips its parity, so what must be even is inversions plus the rows
+    between the blank and the bottom row.
+    """
+    width = width or int(len(tiles)**0.5)
+    parity = inversions(tiles)
+    if not width % 2:
+        parity += width - 1 - list(tiles).index(0) // width
+    return not parity % 2
+
+
+def repair(tiles, width=None):
+    """Make tiles solvable in place by swapping the first two non-blank
+    tiles if needed. The swap flips the parity and keeps the blank, so
+    it pairs every unsolvable arrangement with one solvable one, and
+    shuffling then repairing is still uniform over solvable boards.
+    """
+    if not solvable(tiles, width):
+        i, j = [k for k, x in enumerate(tiles[:3]) if x][:2]
+        tiles[i], tiles[j] = tiles[j], tiles[i]
+    return tiles
+
+
+def shuffled(width, count=None, seed=None):
+    """Uniformly random solvable packed boards, `count` of them or forever."""
+    rng = random.Random(seed)
+    layout = Layout.of(width)
+    pack, shuffle = layout.pack, rng.shuffle
+    tiles = layout.unpack(layout.goal)
+    for _ in (range(count) if count is not None else counter()):
+        shuffle(tiles)
+        yield pack(repair(tiles, width))
+
+
+def walk(width, moves, count=None, seed=None):
+    """Packed boards `moves` random blank moves from the goal, never
+    undoing the move before. At most `moves` moves from the goal, often
+    fewer.
+    """
+    rng = random.Random(seed)
+    layout = Layout.of(width)
+    goal, steps, zero, slide = layout.goal, layout.moves, layout.zero, layout.slide
+    choice = rng.choice
+    for _ in (range(count) if count is not None else counter()):
+        board, prev = goal, -1
+        for _ in range(moves):
+            z = zero(board)
+            board = slide(board, choice([i for i in steps[z] if i != prev]))
+            prev = z
+        yield board
+
+
+def band(width, low, high, heuristic, count=None, seed=None, max_moves=None):
+    """Packed boards whose heuristic value is in [low, high], each from a
+    fresh random walk from the goal that stops once the value reaches a
+    target drawn from the band, so values spread over it. A walk that has
+    not got there after max_moves (default 100 moves per cell) starts
+    over. heuristic is a Heuristic of this width, kept up to date by its
+    update() rather than rescored.
+    """
+    rng = random.Random(seed)
+    layout = Layout.of(width)
+    children, zero = layout.children, layout.zero
+    update, choice = heuristic.update, rng.choice
+    max_moves = max_moves or 100*layout.size
+    h0 = heuristic(layout.goal)
+    made = 0
+    while count is None or made < count:
+        board, h, prev = layout.goal, h0, -1
+        target = rng.randint(low, high)
+        for _ in range(max_moves):
+            z = zero(board)
+            tile, i, board = choice(children(board, prev))
+            h = update(h, board, tile, i, z)
+            prev = z
+            if target <= h <= high:
+                yield board
+                made += 1
+                break
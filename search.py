@@ -1,39 +1,119 @@
 from warnings import warn
-from sys import stdin
+from sys import stdin, platform
 from time import perf_counter as tt
 from time import sleep 
 from collections import deque, namedtuple, defaultdict
 from bisect import bisect
 from copy import copy
-from math import sqrt
+from math import sqrt, inf
 from itertools import repeat, chain
+from heapq import nsmallest
 
-from heap import MinHeap, MaxHeap
+try:
+    from resource import getrusage, RUSAGE_SELF
+except ImportError:
+    getrusage = None
 
+from heap import MinHeap, MaxHeap, BucketQueue
+from rank import RankedSet, ParentLinks, n_ranks
+from prune import MovePruner
+
+
+# Counters of a run, in Search.stats. open and closed are sizes, kept at
+# the largest seen; the engines sample them where it is cheap (per layer,
+# at each report and at the end), the rest are totals.
+STATS = ('expansions', 'generated', 'duplicates', 'open', 'closed', 'heap_ops', 'peak_rss_kib')
+SIZES = ('open', 'closed')
+
+
+def peak_rss_kib():
+    if getrusage is None:
+        return None
+    peak = getrusage(RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if platform == 'darwin' else peak
 
 
 class Search:
+    
+    QUEUE = MinHeap
+    # Expansions between two calls of the progress callback.
+    EVERY = 100_000
+    # Attributes that solver() options may set.
+    OPTIONS = ()
               
-    def __init__(self, start_node, child_func, end_node, cost):
+    def __init__(self, start_node, child_func, end_node, cost, layout=None, heuristic=None,
+                 queue=None, visited='set', callback=None, every=None):
         self.start_node = start_node
         self.child_nodes = child_func
         self.end_node = end_node
         self.cost = cost
+        # Board layout and heuristic, for engines that work on the board
+        # directly instead of through child_func.
+        self.layout = layout
+        self.heuristic = heuristic
+        # Open list class of the best-first engines, e.g. BucketQueue.
+        self.queue = queue or self.QUEUE
+        # 'set' keeps visited nodes in sets and dicts, 'bitset' keeps packed
+        # boards as one bit per permutation rank and parents as one byte,
+        # in dense tables over all ranks, so only up to 3x3.
+        self.visited = visited
+        if visited == 'bitset' and layout is not None:
+            n_ranks(layout)   # too big a board fails here, not mid-search
+        # callback(search) is called every `every` expansions with
+        # search.stats up to date, and may raise to stop the search. Without
+        # one the loops only compare two numbers.
+        self.callback = callback
+        self.every = every or self.EVERY
+        self.stats = dict.fromkeys(STATS, 0)
+        self.base = self.stats
+        
+    def begin(self):
+        # Keep the counters of earlier runs (IDSearch runs once per cap) and
+        # return the expansion count of the first report.
+        self.base = dict(self.stats)
+        return self.every if self.callback else inf
+    
+    def tally(self, **counts):
+        # self.stats as of now: earlier runs plus this run's counters.
+        stats = dict(self.base)
+        for key, x in counts.items():
+            stats[key] = max(stats[key], x) if key in SIZES else stats[key] + x
+        stats['peak_rss_kib'] = peak_rss_kib()
+        self.stats = stats
+        return stats
+    
+    def report(self, **counts):
+        # Call back with the counters so far, return the next report's count.
+        self.tally(**counts)
+        self.callback(self)
+        return counts['expansions'] + self.every
+        
+    def memory(self, nodes=()):
+        if self.visited == 'bitset':
+            return RankedSet(self.layout, nodes)
+        return set(nodes)
+    
+    def links(self, links=()):
+        if self.visited == 'bitset':
+            return ParentLinks(self.layout, links)
+        return dict(links)
         
     def run(self):
         return True
     
-    def timeit(self, start_node=None):
+    def timeit(self, start_node=None, verbose=True):
         """Benchmark the search performance. Wrap over self.run().
         """
         self.found = 0
         self.step = 0
         self.path = []
+        self.stats = dict.fromkeys(STATS, 0)
         t0 = tt()
         result = self.run(start_node)
         t1 = tt()
         self.timelog = timelog = t1-t0
-        print(self)
+        if verbose:
+            print(self)
         return result, timelog
         
     def __str__(self):
@@ -45,13 +125,14 @@ class Search:
 
 class IDSearch(Search):
         
-    def timeit(self, start_node=None, limit=1_000_000):
+    def timeit(self, start_node=None, limit=1_000_000, verbose=True):
         """Benchmark the search performance. Wrap over self.run().
         Iterative Depth Search
         """
         self.found = 0
         self.step = 0
         self.path = []
+        self.stats = dict.fromkeys(STATS, 0)
         cap = 0
         t0 = tt()
         while not self.found and cap < limit:
@@ -59,24 +140,27 @@ class IDSearch(Search):
             cap += 4
         t1 = tt()
         self.timelog = timelog = t1-t0
-        print(self)
+        if verbose:
+            print(self)
         return result, timelog
 
 
 class BreadthFirstSearch(Search):
    
     def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0):
-        memory = set()
+        memory = self.memory()
         end_node = self.end_node
         childs = self.child_nodes
         path = [start_node or self.start_node]
         stack = set([start_node or self.start_node])
-        t0 = tt()
+        report = self.begin()
+        generated = duplicates = widest = 0
         while not found and (-1<step<=cap or -1<depth<=cap) :
-            if tt()-t0 > 3:
-                print(f"Step, Depth  = {step}, {depth}")
-                t0 = tt()
+            if step >= report:
+                report = self.report(expansions=step, generated=generated, duplicates=duplicates,
+                                     open=widest, closed=len(memory))
             diff = 0
+            widest = max(widest, len(stack))
             if end_node in stack:
                 diff += 1
                 stack = list(stack)
@@ -86,12 +170,22 @@ class BreadthFirstSearch(Search):
             else:
                 diff += len(stack)
                 memory.update(stack)
-                stack = set(chain.from_iterable(childs(x) for x in stack)) - memory
+                children, made = set(), 0
+                for x in stack:
+                    kids = childs(x)
+                    made += len(kids)
+                    children.update(kids)
+                stack = children - memory
+                generated += made
+                duplicates += made - len(stack)
+                del children
             if not diff:
                 break
             step += diff
             depth += 1
         del stack
+        self.tally(expansions=step, generated=generated, duplicates=duplicates,
+                   open=widest, closed=len(memory))
         self.step, self.path, self.found = self.step+step, path, bool(found)
         return True
     
@@ -99,17 +193,18 @@ class DepthFirstSearch(IDSearch):
     
     def run(self, start_node=None, depth=0, cap=1, step=0, found=0):
         childs = self.child_nodes
-        memory = set()
+        memory = self.memory()
         memorise = memory.add
         start_node, end_node = start_node or self.start_node, self.end_node
         path = [start_node or self.start_node]
         stack = defaultdict(deque)
         stack[depth] += [start_node or self.start_node]
-        t0 = tt()
+        report = self.begin()
+        generated = duplicates = 0
         while not found and (-1<depth<=cap):
-            if tt()-t0 > 3:
-                print(f"Step, Depth  = {step}, {depth}")
-                t0 = tt()
+            if step >= report:
+                report = self.report(expansions=step, generated=generated, duplicates=duplicates,
+                                     open=sum(map(len, stack.values())), closed=len(memory))
             search_space = stack[depth]
             while len(search_space):
                 if depth == cap:
@@ -131,11 +226,18 @@ class DepthFirstSearch(IDSearch):
                     found = True
                     break
                 depth += 1
-                stack[depth] += list(set(childs(node)) - memory)
+                # path[-2] is the parent (the start node for the start)
+                children = childs(node, path[-2])
+                fresh = set(children) - memory
+                generated += len(children)
+                duplicates += len(children) - len(fresh)
+                stack[depth] += list(fresh)
                 break
             else:
                 path.pop()
                 depth -= 1
+        self.tally(expansions=step, generated=generated, duplicates=duplicates,
+                   open=sum(map(len, stack.values())), closed=len(memory))
         del stack
         self.path, self.step, self.found = path, self.step+step, found
         return True
@@ -146,32 +248,40 @@ class BidirectionSearch(Search):
     def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0):
         childs = self.child_nodes
         head, tail = start_node or self.start_node, self.end_node
-        head_pathfinder, tail_pathfinder = {head:head}, {tail:tail}
+        head_pathfinder, tail_pathfinder = self.links([(head, head)]), self.links([(tail, tail)])
         head_space, tail_space = set([head]), set([tail])
-        head_memory, tail_memory = set([head]), set([tail])
+        head_memory, tail_memory = self.memory([head]), self.memory([tail])
         intersect = set()
         diff = 2
-        t0 = tt()
+        report = self.begin()
+        generated = duplicates = 0
         while not found and -1<step<=cap:
-            if tt()-t0 > 3:
-                print(f"Step, Depth  = {step}, {depth}")
-                t0 = tt()
+            if step >= report:
+                report = self.report(expansions=step, generated=generated, duplicates=duplicates,
+                                     open=len(head_space) + len(tail_space),
+                                     closed=len(head_memory) + len(tail_memory))
             intersect = head_space.intersection(tail_space)
             if intersect:
                 found = True
                 break
-            heads = dict(chain.from_iterable(
-                ((v,k) for v in childs(k) if v not in head_memory) 
-                for k in head_space
-                ))
+            heads, made = {}, 0
+            for k in head_space:
+                kids = childs(k)
+                made += len(kids)
+                heads.update((v,k) for v in kids if v not in head_memory)
+            generated += made
+            duplicates += made - len(heads)
             head_pathfinder.update(heads)
             heads = set(heads.keys())
             head_space.update(heads)
             
-            tails = dict(chain.from_iterable(
-                ((v,k) for v in childs(k) if v not in tail_memory) 
-                for k in tail_space
-                ))
+            tails, made = {}, 0
+            for k in tail_space:
+                kids = childs(k)
+                made += len(kids)
+                tails.update((v,k) for v in kids if v not in tail_memory)
+            generated += made
+            duplicates += made - len(tails)
             tail_pathfinder.update(tails)
             tails = set(tails.keys())
             tail_space.update(tails)
@@ -185,11 +295,12 @@ class BidirectionSearch(Search):
                 break
             depth += 1
         step = len(head_space) + len(tail_space)
+        self.tally(expansions=step, generated=generated, duplicates=duplicates,
+                   open=step, closed=len(head_memory) + len(tail_memory))
         del head_space
         del tail_space
         path = []
         if found:
-            print(intersect)
             middle = list(intersect)[0]
             p1, p2 = middle, head_pathfinder[middle]
             path = deque([middle])
@@ -213,25 +324,227 @@ class HeuristicSearch(Search):
         end_node = self.end_node
         childs = self.child_nodes
         path = [start_node or self.start_node]
-        stack = MinHeap(start_node or self.start_node)
-        t0 = tt()
+        stack = self.queue(start_node or self.start_node)
+        report = self.begin()
+        generated = duplicates = pops = pushes = 0
         while not found and len(stack) and (-1<step<=cap or -1<depth<=cap) :
-            if tt()-t0 > 3:
-                print(f"Step, Depth  = {step}, {depth}")
-                t0 = tt()
-            step += 1
+            if step >= report:
+                report = self.report(expansions=step, generated=generated, duplicates=duplicates,
+                                     open=len(stack), closed=len(memory), heap_ops=pops+pushes)
             node = stack.popleft()
+            pops += 1
+            if node in memory:
+                continue
+            step += 1
             memorise(node)
             if node == end_node:
                 found = 1
                 path.append(node)
                 break
-            stack += set(childs(node)) - memory
+            children = childs(node)
+            fresh = set(children) - memory
+            generated += len(children)
+            duplicates += len(children) - len(fresh)
+            pushes += len(fresh)
+            stack += fresh
             depth += 1
+        self.tally(expansions=step, generated=generated, duplicates=duplicates,
+                   open=len(stack), closed=len(memory), heap_ops=pops+pushes)
         del stack
         self.step, self.path, self.found = self.step+step, path, bool(found)
         return True
 
+
+class AStarSearch(HeuristicSearch):
+    
+    # Unit move costs and integer heuristics keep f a small integer.
+    QUEUE = BucketQueue
+    
+    def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0, weight=1):
+        """A* search. Nodes are expanded by f = g + weight*h, where h is the
+        node's value and g sums self.cost over the path from the start.
+        """
+        start_node = start_node or self.start_node
+        end_node = self.end_node
+        childs = self.child_nodes
+        cost = self.cost
+        g = {start_node: 0}
+        parent = {start_node: None}
+        closed = set()
+        close = closed.add
+        opened = {start_node: (weight*start_node[0], start_node)}
+        queue = self.queue
+        if queue is BucketQueue and weight != int(weight):
+            # Buckets need integer priorities.
+            queue = MinHeap
+        stack = queue(opened[start_node])
+        update = getattr(stack, 'update', None)
+        report = self.begin()
+        generated = duplicates = heap_ops = 0
+        while not found and len(stack) and -1<step<=cap:
+            if step >= report:
+                report = self.report(expansions=step, generated=generated, duplicates=duplicates,
+                                     open=len(opened), closed=len(closed), heap_ops=heap_ops)
+            entry = stack.popleft()
+            heap_ops += 1
+            node = entry[1]
+            if opened.get(node) != entry:
+                # Left behind by a queue without update().
+                continue
+            step += 1
+            del opened[node]
+            close(node)
+            g_node = g[node]
+            depth = max(depth, g_node)
+            if node == end_node:
+                found = 1
+                break
+            children = childs(node)
+            generated += len(children)
+            for child in children:
+                g_child = g_node + cost(child)
+                if g_child >= g.get(child, inf):
+                    duplicates += 1
+                    continue
+                g[child] = g_child
+                parent[child] = node
+                entry = (g_child + weight*child[0], child)
+                if child in opened and update is not None:
+                    update(opened[child], entry)
+                else:
+                    # Re-open a closed node reached by a cheaper path.
+                    closed.discard(child)
+                    stack.append(entry)
+                heap_ops += 1
+                opened[child] = entry
+        self.tally(expansions=step, generated=generated, duplicates=duplicates,
+                   open=len(opened), closed=len(closed), heap_ops=heap_ops)
+        del stack
+        path = deque()
+        if found:
+            while node is not None:
+                path.appendleft(node)
+                node = parent[node]
+        self.step, self.path, self.found = self.step+step, list(path), bool(found)
+        return True
+
+
+class AnytimeSearch(HeuristicSearch):
+    
+    # Heuristic weight of each pass, ending with plain A*.
+    WEIGHTS = (3, 2, 1.5, 1.25, 1)
+    # Expansions between two looks at the clock and the cancel event.
+    CHECK = 256
+    # Budgets: seconds, expansions, and something with is_set() (e.g. a
+    # threading.Event) that stops the search once set.
+    time_limit = None
+    node_limit = None
+    cancel = None
+    OPTIONS = ('time_limit', 'node_limit', 'cancel')
+    
+    def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0):
+        """Anytime repairing A* (ARA*). Each pass is weighted A* with
+        f = g + w*h for the next w in WEIGHTS, keeping the g values and
+        parents of the passes before and reopening only the nodes whose g
+        went down since, and it ends once no open node has f below the cost
+        of the best solution so far. When the weights or a budget run out,
+        self.path is the best solution found and self.bound a proven upper
+        bound on its cost over the optimal one (1 when optimal, inf when
+        there is no solution yet).
+        """
+        start_node = start_node or self.start_node
+        end_node = self.end_node
+        childs = self.child_nodes
+        cost = self.cost
+        g = {start_node: 0}
+        parent = {start_node: None}
+        opened, incons = {start_node: None}, set()
+        best = 0 if start_node == end_node else inf
+        goal = start_node if best == 0 else None
+        deadline = inf if self.time_limit is None else tt() + self.time_limit
+        limit = cap if self.node_limit is None else min(cap, self.node_limit)
+        cancel = self.cancel
+        check = self.CHECK if deadline < inf or cancel is not None else inf
+        report = self.begin()
+        generated = duplicates = heap_ops = 0
+        bound, stopped = inf, False
+        for weight in self.WEIGHTS:
+            queue = self.queue
+            if queue is BucketQueue and weight != int(weight):
+                queue = MinHeap
+            # Open and inconsistent nodes, keyed by the new weight.
+            opened = {n: (g[n] + weight*n[0], n) for n in chain(opened, incons)}
+            stack = queue(*opened.values())
+            update = getattr(stack, 'update', None)
+            heap_ops += len(opened)
+            closed, incons = set(), set()
+            while len(stack):
+                if step >= report:
+                    report = self.report(expansions=step, generated=generated, duplicates=duplicates,
+                                         open=len(opened), closed=len(closed), heap_ops=heap_ops)
+                if step >= check:
+                    check = step + self.CHECK
+                    if tt() > deadline or cancel is not None and cancel.is_set():
+                        stopped = True
+                        break
+                if step >= limit:
+                    stopped = True
+                    break
+                entry = stack.popleft()
+                heap_ops += 1
+                node = entry[1]
+                if opened.get(node) != entry:
+                    # Left behind by a queue without update().
+                    continue
+                if entry[0] >= best:
+                    # Kept open for the next pass.
+                    break
+                step += 1
+                del opened[node]
+                closed.add(node)
+                g_node = g[node]
+                children = childs(node)
+                generated += len(children)
+                for child in children:
+                    g_child = g_node + cost(child)
+                    if g_child >= g.get(child, inf):
+                        duplicates += 1
+                        continue
+                    g[child] = g_child
+                    parent[child] = node
+                    if child == end_node:
+                        best, goal = g_child, child
+                    elif child in closed:
+                        incons.add(child)
+                    else:
+                        entry = (g_child + weight*child[0], child)
+                        if child in opened and update is not None:
+                            update(opened[child], entry)
+                        else:
+                            stack.append(entry)
+                        heap_ops += 1
+                        opened[child] = entry
+            del stack
+            if goal is not None:
+                # Any unfinished path to the goal runs through an open or
+                # inconsistent node, so min g+h over those is a lower bound.
+                lower = min((g[n] + n[0] for n in chain(opened, incons)), default=best)
+                ratio = 1 if lower >= best else best/lower if lower > 0 else inf
+                bound = max(1, min(bound if stopped else weight, ratio))
+            if stopped:
+                break
+        self.tally(expansions=step, generated=generated, duplicates=duplicates,
+                   open=len(opened), closed=len(closed), heap_ops=heap_ops)
+        path = deque()
+        node = goal
+        while node is not None:
+            path.appendleft(node)
+            node = parent[node]
+        self.bound = bound
+        self.step, self.path, self.found = self.step+step, list(path), goal is not None
+        return True
+
+
 class ForeseeSearch(Search):
     
     def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0, foresee_step=16):
@@ -240,33 +553,42 @@ class ForeseeSearch(Search):
         end_node = self.end_node
         childs = self.child_nodes
         self.path = path = [start_node or self.start_node]
-        stack = MinHeap(start_node or self.start_node)
-        t0 = tt()
+        stack = self.queue(start_node or self.start_node)
+        report = self.begin()
+        generated = duplicates = heap_ops = 0
         while not found and len(stack) and (-1<step<=cap or -1<depth<=cap) :
-            if tt()-t0 > 3:
-                print(f"Step, Depth  = {step}, {depth}")
-                t0 = tt()
+            if step >= report:
+                report = self.report(expansions=step, generated=generated, duplicates=duplicates,
+                                     open=len(stack), closed=len(memory), heap_ops=heap_ops)
             step += 1
             try:
                 parent = stack.popleft()
             except IndexError:
                 found = 0
                 break
+            heap_ops += 1
             memorise(parent)
             if parent == end_node:
                 found = 1
                 path.append(parent)
                 break
-            new_nodes = set(childs(parent)) - memory
+            children = childs(parent)
+            new_nodes = set(children) - memory
+            generated += len(children)
+            duplicates += len(children) - len(new_nodes)
             backtrack = {child:parent for child in new_nodes}
             working_memory = memory | new_nodes
             count = 1
-            foreseeing = MinHeap()
+            foreseeing = self.queue()
             foreseeing += new_nodes
+            heap_ops += len(new_nodes)
             while (not found) and new_nodes and count < foresee_step:
                 all_new_childs = set()
                 for new_node in new_nodes:
-                    new_childs = set(childs(new_node)) - working_memory
+                    children = childs(new_node)
+                    new_childs = set(children) - working_memory
+                    generated += len(children)
+                    duplicates += len(children) - len(new_childs)
                     working_memory |= new_childs
                     all_new_childs |= new_childs
                     backtrack.update({child:new_node for child in new_childs})
@@ -275,10 +597,12 @@ class ForeseeSearch(Search):
                         break
                 new_nodes = all_new_childs
                 foreseeing += all_new_childs
+                heap_ops += len(all_new_childs)
                 count += 1
             # Walk to the node of lowest cost
             if len(foreseeing):
                 destination = foreseeing.popleft()
+                heap_ops += 1
                 if destination <= parent: 
                     backpath = [destination]
                     _from, _to = backtrack[destination], destination
@@ -287,6 +611,7 @@ class ForeseeSearch(Search):
                         # Since we don't know if they will lead us to the end,
                         # we haven't explore them yet.
                         stack.append(_to)
+                        heap_ops += 1
                         backpath.append(_from)
                         _from, _to = backtrack[_from], _from
                     backpath = backpath[::-1]   
@@ -296,51 +621,224 @@ class ForeseeSearch(Search):
                 break
             depth += count
             
+        self.tally(expansions=step, generated=generated, duplicates=duplicates,
+                   open=len(stack), closed=len(memory), heap_ops=heap_ops)
         del stack
         self.step, self.path, self.found = self.step+step, path, bool(found)
         return True
         
-class IDASearch(IDSearch):   
+class IDASearch(Search):
+    
+    # Longest redundant move string the tile walk rules out, by a
+    # MovePruner; 2 only stops it undoing the last move.
+    prune = 8
+    OPTIONS = ('prune',)
     
     def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0):
-        childs = self.child_nodes
-        memory = set()
-        memorise = memory.add
-        start_node, end_node = start_node or self.start_node, self.end_node
-        path = [start_node or self.start_node]
-        stack = defaultdict(MinHeap)
-        stack[depth] += [start_node or self.start_node]
-        t0 = tt()
-        while not found and (-1<depth<=cap):
-            if tt()-t0 > 3:
-                print(f"Step, Depth  = {step}, {depth}")
-                t0 = tt()
-            search_space = stack[depth]
-            while len(search_space):
-                if depth == cap:
-                    if end_node in search_space:
-                        step += len(search_space)
-                        found = True
-                        break
-                    else:
-                        path.pop()
-                        depth -= 1
-                        break
-                node = search_space.popleft()
-                if node in memory:
+        """Iterative deepening A*. Each iteration is a depth-first walk cut
+        off at f = g + h > bound, and the next bound is the smallest f that
+        went over. Nothing is memorised: with a layout and a heuristic the
+        walk mutates one tile list in place and undoes each move on the way
+        back, skipping moves that end a redundant move string; otherwise it
+        walks child_func and only skips the parent.
+        """
+        start_node = start_node or self.start_node
+        if self.layout is not None and self.heuristic is not None:
+            walk = self._walk_tiles
+        else:
+            walk = self._walk_nodes
+        bound, path = start_node[0], None
+        report = self.begin()
+        generated = duplicates = 0
+
+        def progress(expanded, made, depth):
+            # Report from inside a walk; returns the walk's next report count.
+            nonlocal report
+            report = self.report(expansions=step+expanded, generated=generated+made,
+                                 duplicates=duplicates+expanded-1, open=depth)
+            return report - step
+
+        while not found and bound <= cap:
+            bound, path, expanded, made = walk(start_node, bound, report-step, progress)
+            step += expanded
+            # Every expanded node but the first skips at least its parent.
+            generated += made
+            duplicates += max(expanded-1, 0)
+            found = path is not None
+        self.tally(expansions=step, generated=generated, duplicates=duplicates)
+        self.path, self.step, self.found = path or [], self.step+step, found
+        return True
+
+    def _walk_tiles(self, start_node, bound, report=inf, progress=None):
+        layout, heuristic = self.layout, self.heuristic
+        h, board = start_node
+        tiles = layout.unpack(board)
+        goal = layout.unpack(layout.goal)
+        moves = tuple(map(tuple, map(zip, layout.moves, layout.directions)))
+        table = MovePruner.of(self.prune).table
+        update = heuristic.update_tiles
+        trail = []
+        push, pop = trail.append, trail.pop
+        step = calls = 0
+
+        def dfs(z, g, h, s):
+            # s: pruner state of the moves so far
+            nonlocal step, calls, report
+            calls += 1
+            f = g + h
+            if f > bound:
+                return f
+            if not h and tiles == goal:
+                return -1
+            step += 1
+            if step >= report:
+                report = progress(step, calls-1, len(trail))
+            least = inf
+            g += 1
+            after = table[s]
+            for i, d in moves[z]:
+                if after[d] < 0:
                     continue
-                memorise(node)
-                step += 1
-                path.append(node)
-                if node == end_node:
-                    found = True
-                    break
-                depth += 1
-                stack[depth] += set(childs(node)) - memory
+                x = tiles[i]
+                tiles[z], tiles[i] = x, 0
+                push(i)
+                t = dfs(i, g, update(h, tiles, x, i, z), after[d])
+                if t < 0:
+                    return t
+                pop()
+                tiles[z], tiles[i] = 0, x
+                if t < least:
+                    least = t
+            return least
+
+        t = dfs(layout.zero(board), 0, h, 0)
+        if t >= 0:
+            return t, None, step, calls-1
+        # Replay the blank's trail through child_func to get real nodes.
+        zero = layout.zero
+        path = [start_node]
+        for i in trail:
+            path.append(next( x for x in self.child_nodes(path[-1]) 
+                              if zero(x[1]) == i ))
+        return t, path, step, calls-1
+
+    def _walk_nodes(self, start_node, bound, report=inf, progress=None):
+        childs, cost, end_node = self.child_nodes, self.cost, self.end_node
+        path = [start_node]
+        push, pop = path.append, path.pop
+        step = calls = 0
+
+        def dfs(node, g, prev):
+            nonlocal step, calls, report
+            calls += 1
+            f = g + node[0]
+            if f > bound:
+                return f
+            if node == end_node:
+                return -1
+            step += 1
+            if step >= report:
+                report = progress(step, calls-1, len(path))
+            least = inf
+            for child in childs(node, prev):
+                push(child)
+                t = dfs(child, g + cost(child), node)
+                if t < 0:
+                    return t
+                pop()
+                if t < least:
+                    least = t
+            return least
+
+        t = dfs(start_node, 0, None)
+        return (t, None, step, calls-1) if t >= 0 else (t, path, step, calls-1)
+
+
+class DescentSearch(Search):
+    
+    def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0):
+        """Walk downhill on an exact heuristic such as a full distance table:
+        every move goes to a child one closer to the goal. Gives up as soon
+        as no child is closer, i.e. the heuristic is not exact here.
+        """
+        node = start_node or self.start_node
+        end_node = self.end_node
+        childs = self.child_nodes
+        path = [node]
+        report = self.begin()
+        generated = 0
+        while -1<step<=cap:
+            if step >= report:
+                report = self.report(expansions=step, generated=generated)
+            if node == end_node:
+                found = 1
                 break
-            else:
-                path.pop()
-                depth -= 1
-        del stack
-        self.path, self.step, self.found = path, self.step+step, found
-        return True
\ No newline at end of file
+            step += 1
+            children = childs(node)
+            generated += len(children)
+            best = min(children)
+            if not best < node:
+                break
+            node = best
+            path.append(node)
+        self.tally(expansions=step, generated=generated)
+        self.step, self.path, self.found = self.step+step, path if found else [], bool(found)
+        return True
+
+
+class BeamSearch(Search):
+    
+    # Nodes kept per depth, and how many layers back repeats are dropped.
+    beam_width = 1000
+    window = 4
+    OPTIONS = ('beam_width', 'window')
+    
+    def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0):
+        """Beam search: breadth-first, but each depth keeps only the
+        beam_width children of lowest value. A whole beam is expanded at
+        once, and children already kept in the last `window` layers are
+        dropped before choosing. Time and memory per depth stay bounded by
+        the beam, at the price of long paths, and the goal can slip out of
+        the beam for good; the search then runs until cap.
+        """
+        start_node = start_node or self.start_node
+        end_node = self.end_node
+        childs = self.child_nodes
+        width = self.beam_width
+        beam = [start_node]
+        window = deque([set(beam)], maxlen=max(self.window, 1))
+        parents = []
+        report = self.begin()
+        generated = duplicates = 0
+        while beam and -1<step<=cap:
+            if step >= report:
+                report = self.report(expansions=step, generated=generated, duplicates=duplicates,
+                                     open=len(beam), closed=sum(map(len, window)))
+            if end_node in window[-1]:
+                found = 1
+                break
+            step += len(beam)
+            links = {}
+            for node in beam:
+                for child in childs(node):
+                    generated += 1
+                    if child in links or any(child in seen for seen in window):
+                        duplicates += 1
+                        continue
+                    links[child] = node
+            beam = nsmallest(width, links)
+            parents.append({x: links[x] for x in beam})
+            window.append(set(beam))
+            depth += 1
+        self.tally(expansions=step, generated=generated, duplicates=duplicates,
+                   open=len(beam), closed=sum(map(len, window)))
+        path = []
+        if found:
+            node = next(x for x in window[-1] if x == end_node)
+            path.append(node)
+            for links in reversed(parents):
+                node = links[node]
+                path.append(node)
+            path.reverse()
+        self.step, self.path, self.found = self.step+step, path, bool(found)
+        return True
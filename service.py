@@ -0,0 +1,284 @@
+# Solver service over localhost TCP
+import asyncio
+import json
+import sys
+from argparse import ArgumentParser
+from multiprocessing import Pipe, Process
+from os import cpu_count
+from time import time
+
+from board import Layout
+from cache import SolutionCache
+from prune import MovePruner
+from search import IDASearch
+from SquareSortGame import SquareSortGame
+
+
+HOST, PORT = '127.0.0.1', 8750
+
+
+def _solve(width, board, method, cache=None):
+    # One solve, in a process the service kills at the request's deadline.
+    game = SquareSortGame(width, None if cache is None else SolutionCache(width, cache))
+    result = game.solve(board, method)
+    result['status'] = 'ok'
+    return result
+
+
+def _tables(width, method):
+    # Build the tables of the method's heuristic into the table cache
+    # (patterndb.cache_dir()), or refuse with ValueError.
+    heuristic = SquareSortGame(width).heuristic_methods.get(method)
+    if hasattr(heuristic, 'load'):
+        heuristic.load()
+    return {'status': 'ok'}
+
+
+def _child(conn, work, *args):
+    # Body of a worker process: send back work(*args), or the error of a
+    # bad request.
+    try:
+        result = work(*args)
+    except ValueError as e:
+        result = {'status': 'error', 'error': str(e)}
+    conn.send(result)
+    conn.close()
+
+
+class SolverService:
+    """Solve requests from many clients on a pool of worker processes.
+
+    Requests are JSON objects, one per line: board (text or a list of
+    tiles), and optionally id, method, width and deadline (seconds from
+    arrival). Each gets one JSON line back as the request finishes, with
+    its id and a status of 'ok' (plus the fields of SquareSortGame.solve),
+    'timeout' or 'error'. A connection may send many requests without
+    waiting; answers come in the order they finish.
+
+    At most `workers` solves run at once, each in a process of its own,
+    and the rest wait their turn. A request past its deadline gets
+    'timeout' whether it is waiting or running; a running solve is killed
+    then and its slot freed. A board already being solved by the same
+    method is not solved again: the request waits on the running solve,
+    and solves again only if that one times out first.
+
+    Heuristic tables (pattern databases, the distance table) are built
+    once per width and method, in a process of their own that holds no
+    slot and no deadline. A request waits for its method's tables until
+    its deadline, while the build goes on for later requests. A method
+    with no tables for the width gets 'error'.
+    """
+
+    def __init__(self, workers=None, method='idaman', deadline=30., cache=None):
+        self.workers = workers or cpu_count() or 1
+        self.method, self.deadline, self.cache = method, deadline, cache
+        self.slots = None
+        # (width, board, method) -> future of the solve in flight
+        self.running = {}
+        # (width, method) -> future of its table build
+        self.tables = {}
+        self.shared = 0
+
+    async def start(self, host=HOST, port=PORT):
+        # built here once, forked solves start with it
+        MovePruner.of(IDASearch.prune)
+        self.slots = asyncio.Semaphore(self.workers)
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        # cancelled calls kill their processes on the way out
+        pending = [f for f in (*self.running.values(), *self.tables.values()) if not f.done()]
+        for future in pending:
+            future.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def handle(self, reader, writer):
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.answer(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            writer.close()
+
+    async def answer(self, line, writer):
+        request = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError(f"Not a request: {line.decode().strip()}")
+            result = await self.solve(request)
+        except Exception as e:
+            # bad requests, and solves that died with their worker
+            result = {'status': 'error', 'error': str(e) or repr(e)}
+        result['id'] = request.get('id') if isinstance(request, dict) else None
+        writer.write(json.dumps(result).encode() + b'\n')
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def solve(self, request):
+        """Answer one request (a dict), as a result dict."""
+        arrival = time()
+        board, method = request['board'], request.get('method', self.method)
+        if method not in SquareSortGame.search_methods:
+            raise ValueError(f"Unknown method: {method}")
+        if not isinstance(board, str):
+            board = ' '.join(map(str, board))
+        width = request.get('width') or Layout.width_of(board)
+        layout = Layout.of(width)
+        tiles = board.replace(',', ' ').split()
+        if len(tiles) != layout.size:
+            raise ValueError(f"Not a board of width {width}: {board}")
+        deadline = arrival + float(request.get('deadline', self.deadline))
+        key = (width, layout.format(layout.pack(tiles)), method)
+        while True:
+            future = self.running.get(key)
+            if future is None:
+                future = self.running[key] = asyncio.ensure_future(
+                    self.run(width, key[1], method, deadline))
+                future.add_done_callback(lambda _: self.running.pop(key, None))
+            else:
+                self.shared += 1
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), deadline - time())
+            except asyncio.TimeoutError:
+                result = {'status': 'timeout'}
+                break
+            # a shared solve that ran out before this request's deadline
+            # is tried again with it
+            if result['status'] != 'timeout' or time() >= deadline:
+                break
+        result = dict(result)
+        result['wait'] = time() - arrival
+        return result
+
+    async def run(self, width, board, method, deadline):
+        build = self.tables.get((width, method))
+        if build is None:
+            build = self.tables[width, method] = asyncio.ensure_future(
+                self.call(None, _tables, width, method))
+        try:
+            built = await asyncio.wait_for(asyncio.shield(build), deadline - time())
+        except asyncio.TimeoutError:
+            return {'status': 'timeout'}
+        if built['status'] != 'ok':
+            return built
+        async with self.slots:
+            if time() > deadline:
+                return {'status': 'timeout'}
+            return await self.call(deadline, _solve, width, board, method, self.cache)
+
+    async def call(self, deadline, work, *args):
+        """work(*args) in a new process, as a result dict; 'timeout' once
+        past deadline (None for none), when the process is killed.
+        """
+        loop = asyncio.get_running_loop()
+        here, there = Pipe(duplex=False)
+        # not a daemon, so methods that start processes of their own can
+        proc = Process(target=_child, args=(there, work) + args)
+        proc.start()
+        there.close()
+        ready = loop.create_future()
+        loop.add_reader(here.fileno(), lambda: ready.done() or ready.set_result(None))
+        try:
+            await asyncio.wait_for(ready, None if deadline is None else deadline - time())
+            return here.recv()
+        except asyncio.TimeoutError:
+            return {'status': 'timeout'}
+        except EOFError:
+            # sets the exit code
+            proc.join()
+            return {'status': 'error', 'error': f"worker died with exit code {proc.exitcode}"}
+        finally:
+            loop.remove_reader(here.fileno())
+            if proc.is_alive():
+                proc.kill()
+            proc.join()
+            here.close()
+
+
+async def ask(requests, host=HOST, port=PORT):
+    """Send requests (dicts) down one connection at once and return the
+    answers by id, numbering requests without one.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for i, request in enumerate(requests):
+            request = dict(request)
+            request.setdefault('id', i)
+            writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+        answers = {}
+        while len(answers) < len(requests):
+            line = await reader.readline()
+            if not line:
+                break
+            answer = json.loads(line)
+            answers[answer['id']] = answer
+        return answers
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def serve(args):
+    service = SolverService(args.jobs or None, args.method, args.deadline, cache=args.cache)
+    server = await service.start(args.host, args.port)
+    print(f"serving on {args.host}:{args.port} with {service.workers} workers",
+          file=sys.stderr, flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Solve boards for clients on localhost.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    server = commands.add_parser('serve', help="run the service")
+    server.add_argument('--jobs', type=int, default=0, help="worker processes, 0 for one per CPU")
+    server.add_argument('--method', default='idaman', choices=sorted(SquareSortGame.search_methods),
+                        help="method of requests that name none")
+    server.add_argument('--deadline', type=float, default=30.,
+                        help="seconds per request that sets none")
+    server.add_argument('--cache', metavar='PATH', help="solution cache file for the workers")
+    client = commands.add_parser('ask', help="send one board per line, print the answers")
+    client.add_argument('file', nargs='?', default='-', help="boards (default: stdin)")
+    client.add_argument('--method')
+    client.add_argument('--deadline', type=float)
+    for command in (server, client):
+        command.add_argument('--host', default=HOST)
+        command.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    f = sys.stdin if args.file == '-' else open(args.file)
+    try:
+        boards = [line.strip() for line in f if line.strip()]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    options = {key: value for key, value in (('method', args.method), ('deadline', args.deadline))
+               if value is not None}
+    answers = asyncio.run(ask([dict(options, board=board) for board in boards],
+                              args.host, args.port))
+    for i in range(len(boards)):
+        print(json.dumps(answers.get(i, {'id': i, 'status': 'error', 'error': 'no answer'})))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# Vectorized layer search, needs NumPy
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from search import BreadthFirstSearch, BidirectionSearch
+
+
+_neighbors = {}
+
+
+def neighbors(layout):
+    """(size, 4) array of the positions the blank can swap with, -1 padded."""
+    table = _neighbors.get(layout.width)
+    if table is None:
+        table = np.full((layout.size, 4), -1, dtype=np.intp)
+        for z, moves in enumerate(layout.moves):
+            table[z, :len(moves)] = moves
+        _neighbors[layout.width] = table
+    return table
+
+
+def to_array(boards, layout):
+    return np.array([layout.unpack(b) for b in boards], dtype=np.uint8).reshape(-1, layout.size)
+
+
+def expand(frontier, layout):
+    """Every child of every board in a (boards, cells) uint8 array, and the
+    row of the parent each child came from.
+    """
+    zeros = (frontier == 0).argmax(axis=1)
+    targets = neighbors(layout)[zeros]
+    rows, cols = np.nonzero(targets >= 0)
+    src, dst = targets[rows, cols], zeros[rows]
+    children = frontier[rows]
+    k = np.arange(len(rows))
+    children[k, dst] = children[k, src]
+    children[k, src] = 0
+    return children, rows
+
+
+def keys(array):
+    """One sortable key per row: 4 bits per cell in a uint64 up to 4x4,
+    the raw row bytes above that.
+    """
+    m, n = array.shape
+    if n <= 16:
+        shifts = np.arange(n, dtype=np.uint64) * np.uint64(4)
+        return np.bitwise_or.reduce(array.astype(np.uint64) << shifts, axis=1)
+    return np.ascontiguousarray(array).view(np.dtype((np.void, n))).ravel()
+
+
+def next_layer(frontier, before, layout):
+    # Children minus repeats and minus the layer before this one, and how
+    # many children there were. Moves alternate the blank's colour, so a
+    # child can only be a new board or a board of the previous layer.
+    children, parents = expand(frontier, layout)
+    ckeys = keys(children)
+    ckeys, first = np.unique(ckeys, return_index=True)
+    fresh = ~np.isin(ckeys, before, assume_unique=True)
+    first = first[fresh]
+    return children[first], parents[first], ckeys[fresh], len(children)
+
+
+def replay(search, start_node, rows):
+    # Turn board rows back into the nodes the search's child_func produces.
+    layout = search.layout
+    path = [start_node]
+    for row in rows[1:]:
+        board = layout.pack(row.tolist())
+        path.append(next( x for x in search.child_nodes(path[-1])
+                          if getattr(x, 'state', x) == board ))
+    return path
+
+
+def trace(layers, i):
+    # Boards from layer 0 to row i of the last layer, following parents.
+    path = []
+    for boards, parents in reversed(layers):
+        path.append(boards[i])
+        i = parents[i]
+    return path[::-1]
+
+
+class VectorBreadthFirstSearch(BreadthFirstSearch):
+
+    def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0):
+        """Level-synchronous BFS over whole layers held as NumPy arrays.
+        Falls back to BreadthFirstSearch without NumPy or a layout.
+        """
+        layout = self.layout
+        if np is None or layout is None:
+            return super().run(start_node, depth, cap, step, found)
+        start_node = start_node or self.start_node
+        goal = keys(to_array([getattr(self.end_node, 'state', self.end_node)], layout))
+        frontier = to_array([getattr(start_node, 'state', start_node)], layout)
+        current = keys(frontier)
+        before = current[:0]
+        layers = [(frontier, np.zeros(1, dtype=np.intp))]
+        path = []
+        report = self.begin()
+        generated = duplicates = widest = 0
+        while not found and len(frontier) and (-1<step<=cap or -1<depth<=cap):
+            if step >= report:
+                report = self.report(expansions=step, generated=generated,
+                                     duplicates=duplicates, open=widest)
+            widest = max(widest, len(frontier))
+            hit = np.nonzero(current == goal)[0]
+            if len(hit):
+                path = replay(self, start_node, trace(layers, hit[0]))
+                found = 1
+                break
+            step += len(frontier)
+            frontier, parents, keys_, made = next_layer(frontier, before, layout)
+            generated += made
+            duplicates += made - len(frontier)
+            before, current = current, keys_
+            layers.append((frontier, parents))
+            depth += 1
+        self.tally(expansions=step, generated=generated, duplicates=duplicates, open=widest)
+        self.step, self.path, self.found = self.step+step, path, bool(found)
+        return True
+
+
+class VectorBidirectionSearch(BidirectionSearch):
+
+    def run(self, start_node=None, depth=0, cap=1_000_000, step=0, found=0):
+        """Bidirectional BFS over NumPy layers, always growing the smaller
+        side. Falls back to BidirectionSearch without NumPy or a layout.
+        """
+        layout = self.layout
+        if np is None or layout is None:
+            return super().run(start_node, depth, cap, step, found)
+        start_node = start_node or self.start_node
+        sides = []
+        for node in (start_node, self.end_node):
+            frontier = to_array([getattr(node, 'state', node)], layout)
+            current = keys(frontier)
+            sides.append([frontier, current, current[:0], [(frontier, np.zeros(1, dtype=np.intp))]])
+        path = []
+        report = self.begin()
+        generated = duplicates = 0
+        while not found and -1<step<=cap:
+            if step >= report:
+                report = self.report(expansions=step, generated=generated, duplicates=duplicates,
+                                     open=len(sides[0][0]) + len(sides[1][0]))
+            common, i, j = np.intersect1d(sides[0][1], sides[1][1], return_indices=True)
+            if len(common):
+                head = trace(sides[0][3], i[0])
+                tail = trace(sides[1][3], j[0])
+                path = replay(self, start_node, head + tail[-2::-1])
+                found = 1
+                break
+            side = sides[len(sides[1][0]) < len(sides[0][0])]
+            frontier, before, current = side[0], side[2], side[1]
+            if not len(frontier):
+                break
+            step += len(frontier)
+            frontier, parents, keys_, made = next_layer(frontier, before, layout)
+            generated += made
+            duplicates += made - len(frontier)
+            side[0], side[1], side[2] = frontier, keys_, current
+            side[3].append((frontier, parents))
+            depth += 1
+        self.tally(expansions=step, generated=generated, duplicates=duplicates,
+                   open=len(sides[0][0]) + len(sides[1][0]))
+        self.path, self.step, self.found = path, self.step+step, bool(found)
+        return True